@@ -1,18 +1,42 @@
 from flask import Flask
 from config import Config
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from app.cache import Cache
+from app.database import SQLAlchemy
+from app.encoding import Encoder
+from app.instrumentation import Instrumentation
+from app.jobs import Jobs
+from app.notifier import Notifier
+from app.passwords import PasswordHasher
+from app.replicas import Replicas
+from app.tokens import Tokens
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db = SQLAlchemy(app)
 migrate = Migrate(app, db)
+replicas = Replicas(app, db)
+cache = Cache(app)
+encoder = Encoder(app)
+passwords = PasswordHasher(app)
+tokens = Tokens(app)
+instrumentation = Instrumentation(app, db)
+jobs = Jobs(app, db)
+notifier = Notifier(app, db)
 
-from app import models, errors
+from app import models, errors, commands
 
 from .views.user import user
 from .views.child import child
 from .views.auth import auth
+from .views.status import status
+from .views.metrics import metrics
+from .views.job import job
+from .views.admin import admin
 app.register_blueprint(user, url_prefix='/v1/users')
 app.register_blueprint(child, url_prefix='/v1/children')
 app.register_blueprint(auth, url_prefix='/v1/auth')
+app.register_blueprint(status, url_prefix='/v1/status')
+app.register_blueprint(job, url_prefix='/v1/jobs')
+app.register_blueprint(admin, url_prefix='/v1/admin')
+app.register_blueprint(metrics)
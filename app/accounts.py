@@ -0,0 +1,196 @@
+import re
+from collections import OrderedDict
+
+import psycopg2
+from sqlalchemy import case, func, or_, select, sql
+
+from app import archive, cache, changes, db, jobs, summaries
+from app.models import Child, Event, User, user_child
+
+
+def delete_user_account(user_id):
+    """Delete a User and the Children that no other User looks after, returning the cache namespaces to invalidate.
+
+    Runs the same few statements however many Children and Events the User has, leaving the foreign key cascades
+    to remove Events, daily summaries and guardianships. Returns None if there is no such User.
+    """
+    user_id = str(user_id)
+
+    # Lock the user and their children, in a consistent order, so a co-guardian deleting their account at the same
+    # time waits for this transaction and then finds the children orphaned rather than both leaving them behind
+    if db.session.query(User.id).filter(User.id == user_id).with_for_update().first() is None:
+        return None
+    child_ids = select([user_child.c.child_id]).where(user_child.c.user_id == user_id)
+    db.session.query(Child.id).filter(Child.id.in_(child_ids)).order_by(Child.id).with_for_update().all()
+
+    guardians = db.session.query(user_child.c.child_id, func.array_agg(user_child.c.user_id)) \
+                          .filter(user_child.c.child_id.in_(child_ids)) \
+                          .group_by(user_child.c.child_id).all()
+    orphans = [child_id for child_id, user_ids in guardians if len(user_ids) == 1]
+    shared = [child_id for child_id, user_ids in guardians if len(user_ids) > 1]
+
+    # The user's events on shared children lose their user_id, so appear as updates in those children's feeds. Clear
+    # it here rather than leave it to the foreign key, which would not move updated_at and so leave ETags unchanged
+    changes.record_matching(shared, Event.user_id == user_id, 'updated')
+    if shared:
+        Event.query.filter(Event.child_id.in_(shared), Event.user_id == user_id) \
+                   .update({'user_id': None, 'updated_at': func.now()}, synchronize_session=False)
+    archived = archive.archived_events(shared).alias('archived_event')
+    changes.record_matching(shared, archived.c.user_id == user_id, 'updated', events=archived)
+    archive.forget_user(shared, user_id)
+    if orphans:
+        Child.query.filter(Child.id.in_(orphans)).delete(synchronize_session=False)
+    User.query.filter(User.id == user_id).delete(synchronize_session=False)
+
+    # Co-guardians' lists of children include this user's id, and their children's events lose it
+    namespaces = ['user:{0}'.format(user_id)]
+    for child_id, user_ids in guardians:
+        namespaces.extend(['child:{0}'.format(child_id), 'events:{0}'.format(child_id)])
+        namespaces.extend('user:{0}'.format(guardian_id) for guardian_id in user_ids)
+    return namespaces
+
+
+@jobs.handler('delete_user')
+def delete_user_job(user_id):
+    namespaces = delete_user_account(user_id)
+    db.session.commit()
+    if namespaces is not None:
+        cache.invalidate(*namespaces)
+
+
+# Tables in an account export, in foreign key order
+EXPORT_TABLES = [User.__table__, Child.__table__, user_child, Event.__table__]
+
+COPY_STATEMENT = re.compile(r'^COPY (\w+) \((\w+(?:, \w+)*)\) FROM stdin;$')
+
+
+def export_accounts(file, user_ids=None):
+    """Write Users, their Children, guardianships and Events to a binary file with COPY, returning the row counts.
+
+    The file is in the format of a pg_dump data section, one COPY block per table in foreign key order, read with a
+    single COPY per table from one consistent snapshot. Given user_ids, only those Users' Children are exported,
+    along with every other User who looks after them. Events by anyone else are exported without their user_id.
+    Archived Events are exported as ordinary ones.
+    """
+    users = User.__table__.select()
+    children = Child.__table__.select()
+    links = user_child.select()
+    events = select(list(archive.all_events().c))
+    if user_ids is not None:
+        user_ids = [str(user_id) for user_id in user_ids]
+        child_ids = select([user_child.c.child_id]).where(user_child.c.user_id.in_(user_ids))
+        guardian_ids = select([user_child.c.user_id]).where(user_child.c.child_id.in_(child_ids))
+        exported_user_ids = select([User.id]).where(or_(User.id.in_(user_ids), User.id.in_(guardian_ids)))
+
+        users = users.where(User.id.in_(exported_user_ids))
+        children = children.where(Child.id.in_(child_ids))
+        links = links.where(user_child.c.child_id.in_(child_ids))
+        source = archive.all_events(child_ids)
+        event_user_id = case([(source.c.user_id.in_(exported_user_ids), source.c.user_id)]).label('user_id')
+        events = select([event_user_id if column.name == 'user_id' else column for column in source.c])
+
+    connection = db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+    connection.execute('SET LOCAL statement_timeout = 0')
+    cursor = connection.connection.cursor()
+
+    file.write(b'-- diary-api account export\n\n')
+    counts = OrderedDict()
+    for table, query in zip(EXPORT_TABLES, [users, children, links, events]):
+        file.write('COPY {0} ({1}) FROM stdin;\n'.format(
+            table.name, ', '.join(column.name for column in table.columns)).encode('UTF-8'))
+        compiled = query.compile(dialect=connection.dialect)
+        query = cursor.mogrify(str(compiled), compiled.params).decode('UTF-8')
+        cursor.copy_expert('COPY ({0}) TO STDOUT'.format(query), file)
+        counts[str(table.name)] = cursor.rowcount
+        file.write(b'\\.\n\n')
+    return counts
+
+
+def import_accounts(file):
+    """Add the rows in a file written by export_accounts, keeping their IDs, returning the row counts and the cache
+    namespaces to invalidate.
+
+    Each COPY block is loaded into a temporary table with COPY, then added to its table in foreign key order with a
+    single INSERT ... SELECT, before recording the new Events in the change feed and rebuilding the affected daily
+    summaries. Nothing is loaded through the ORM. Raises ValueError for a malformed file, and IntegrityError if any
+    row conflicts with one that already exists.
+    """
+    tables = OrderedDict((str(table.name), table) for table in EXPORT_TABLES)
+    connection = db.session.connection()
+    connection.execute('SET LOCAL statement_timeout = 0')
+    cursor = connection.connection.cursor()
+    preparer = connection.dialect.identifier_preparer
+
+    staged = {}
+    for line in iter(file.readline, b''):
+        line = line.decode('UTF-8').rstrip('\r\n')
+        if not line or line.startswith('--'):
+            continue
+        match = COPY_STATEMENT.match(line)
+        if match is None or match.group(1) not in tables or match.group(1) in staged:
+            raise ValueError("Expected a COPY block for one of {0}, not '{1}'".format(', '.join(tables), line[:100]))
+        table = tables[match.group(1)]
+        columns = match.group(2).split(', ')
+        unknown = set(columns) - set(table.columns.keys())
+        if unknown:
+            raise ValueError("Unknown {0} columns: {1}".format(table.name, ', '.join(sorted(unknown))))
+
+        staging = 'import_' + table.name
+        cursor.execute('CREATE TEMPORARY TABLE {0} (LIKE {1} INCLUDING DEFAULTS) ON COMMIT DROP'.format(
+            staging, preparer.format_table(table)))
+        try:
+            cursor.copy_expert('COPY {0} ({1}) FROM STDIN'.format(
+                staging, ', '.join(preparer.quote(column) for column in columns)), _CopyBlock(file))
+        except psycopg2.Error as error:
+            raise ValueError('Invalid {0} rows: {1}'.format(table.name, str(error).splitlines()[0]))
+        staged[table.name] = sql.table(staging, *[sql.column(column) for column in columns])
+
+    counts = OrderedDict()
+    for name, table in tables.items():
+        counts[name] = 0
+        if name in staged:
+            columns = [column.name for column in staged[name].columns]
+            counts[name] = connection.execute(table.insert().from_select(columns, staged[name].select())).rowcount
+
+    user_ids, child_ids, event_child_ids = set(), set(), set()
+    if User.__tablename__ in staged:
+        user_ids.update(_distinct(staged[User.__tablename__].c.id))
+    if Child.__tablename__ in staged:
+        child_ids.update(_distinct(staged[Child.__tablename__].c.id))
+    if user_child.name in staged:
+        user_ids.update(_distinct(staged[user_child.name].c.user_id))
+        child_ids.update(_distinct(staged[user_child.name].c.child_id))
+    if Event.__tablename__ in staged:
+        events = staged[Event.__tablename__]
+        event_child_ids.update(_distinct(events.c.child_id))
+        changes.record_matching(sorted(event_child_ids), Event.id.in_(select([events.c.id])), 'created')
+        summaries.rebuild(sorted(event_child_ids))
+
+    namespaces = ['user:{0}'.format(user_id) for user_id in user_ids]
+    for child_id in child_ids | event_child_ids:
+        namespaces.extend(['child:{0}'.format(child_id), 'events:{0}'.format(child_id)])
+    return counts, namespaces
+
+
+def _distinct(column):
+    return [str(value) for value, in db.session.execute(select([column]).distinct())]
+
+
+class _CopyBlock(object):
+    """The rows of one COPY block of an export, read from the file as far as the terminating '\\.' line."""
+
+    def __init__(self, file):
+        self.file = file
+        self.finished = False
+
+    def read(self, size=8192):
+        lines = []
+        length = 0
+        while not self.finished and length < size:
+            line = self.file.readline()
+            if not line or line.rstrip(b'\r\n') == b'\\.':
+                self.finished = True
+            else:
+                lines.append(line)
+                length += len(line)
+        return b''.join(lines)
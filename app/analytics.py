@@ -0,0 +1,129 @@
+import numpy as np
+from sqlalchemy import Float, case, cast, func, select
+
+from app import archive, db
+
+SLEEP, FEED, CHANGE = 0, 1, 2
+EVENT_TYPES = {'sleep': SLEEP, 'feed': FEED, 'change': CHANGE}
+
+ML_PER_FL_OZ = 29.5735
+SECONDS_PER_DAY = 86400
+
+
+def load_event_arrays(child_id, since=None, until=None):
+    """Load a Child's Events, including archived ones, as columnar NumPy arrays, oldest first.
+
+    Timestamps are seconds since the epoch, feed amounts are normalised to millilitres and missing values are NaN.
+    """
+    event = archive.all_events([str(child_id)], since, until).c
+    query = select([
+        cast(func.extract('epoch', event.started_at), Float),
+        cast(func.extract('epoch', event.ended_at), Float),
+        case([(event.unit == 'fl oz', event.amount * ML_PER_FL_OZ)], else_=event.amount),
+        case([(event.type == name, code) for name, code in EVENT_TYPES.items()], else_=-1),
+    ]).where(event.child_id == str(child_id))
+
+    if since is not None:
+        query = query.where(event.started_at >= since)
+    if until is not None:
+        query = query.where(event.started_at < until)
+
+    rows = db.session.execute(query.order_by(event.started_at)).fetchall()
+    columns = np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+    return {
+        'started_at': columns[:, 0],
+        'ended_at': columns[:, 1],
+        'amount_ml': columns[:, 2],
+        'type': columns[:, 3].astype(np.int8),
+    }
+
+
+def compute_statistics(events, now, window=7, percentiles=(25, 50, 75, 90)):
+    """Compute event statistics from columnar arrays as returned by load_event_arrays.
+
+    now is seconds since the epoch and window is the number of days in each rolling average.
+    """
+    started_at = events['started_at']
+    types = events['type']
+    feeds = types == FEED
+    sleeps = types == SLEEP
+
+    # Minutes between the starts of consecutive feeds
+    feed_intervals = np.diff(started_at[feeds]) / 60
+
+    # Minutes asleep for every finished sleep
+    sleep_durations = (events['ended_at'][sleeps] - started_at[sleeps]) / 60
+    sleep_durations = sleep_durations[~np.isnan(sleep_durations)]
+
+    return {
+        "window": window,
+        "feed_intervals": _describe(feed_intervals),
+        "sleep_durations": dict(_describe(sleep_durations), percentiles=_percentiles(sleep_durations, percentiles)),
+        "rolling_averages": _rolling_averages(events, window),
+        "minutes_since_last": {
+            name: _minutes_since(started_at[types == code], now) for name, code in EVENT_TYPES.items()
+        }
+    }
+
+
+def _describe(values):
+    if values.size == 0:
+        return {"count": 0, "mean_minutes": None, "median_minutes": None}
+    return {
+        "count": int(values.size),
+        "mean_minutes": round(float(values.mean()), 1),
+        "median_minutes": round(float(np.median(values)), 1)
+    }
+
+
+def _percentiles(values, percentiles):
+    if values.size == 0:
+        return {str(percentile): None for percentile in percentiles}
+    return {str(percentile): round(float(value), 1)
+            for percentile, value in zip(percentiles, np.percentile(values, percentiles))}
+
+
+def _minutes_since(started_at, now):
+    if started_at.size == 0:
+        return None
+    return round(float(now - started_at.max()) / 60, 1)
+
+
+def _rolling_averages(events, window):
+    """Trailing per-day averages of feed count, feed volume and sleep minutes, one entry per UTC day."""
+    started_at = events['started_at']
+    if started_at.size == 0:
+        return []
+
+    types = events['type']
+    days = np.floor(started_at / SECONDS_PER_DAY).astype(np.int64)
+    first_day = days.min()
+    offsets = days - first_day
+    length = int(offsets.max()) + 1
+
+    feeds = types == FEED
+    sleeps = types == SLEEP
+    sleep_minutes = np.where(sleeps, (events['ended_at'] - started_at) / 60, 0)
+    totals = {
+        "feeds": np.bincount(offsets, weights=feeds, minlength=length),
+        "feed_ml": np.bincount(offsets, weights=np.where(feeds, np.nan_to_num(events['amount_ml']), 0),
+                               minlength=length),
+        "sleep_minutes": np.bincount(offsets, weights=np.nan_to_num(sleep_minutes), minlength=length),
+    }
+
+    # Sum each trailing window with a cumulative sum, dividing by the days actually covered at the start
+    divisors = np.minimum(np.arange(1, length + 1), window)
+    averages = {}
+    for name, daily in totals.items():
+        cumulative = np.concatenate(([0], np.cumsum(daily)))
+        averages[name] = (cumulative[1:] - cumulative[np.maximum(np.arange(1, length + 1) - window, 0)]) / divisors
+
+    dates = (np.arange(length) + first_day).astype('datetime64[D]').astype(str).tolist()
+    return [
+        {"date": date, "feeds": feeds, "feed_ml": feed_ml, "sleep_minutes": sleep_minutes}
+        for date, feeds, feed_ml, sleep_minutes in zip(dates,
+                                                       np.round(averages["feeds"], 2).tolist(),
+                                                       np.round(averages["feed_ml"], 1).tolist(),
+                                                       np.round(averages["sleep_minutes"], 1).tolist())
+    ]
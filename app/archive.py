@@ -0,0 +1,138 @@
+from collections import namedtuple
+
+from sqlalchemy import cast, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, array
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Event, EventArchive
+from app.partitions import month_bounds, month_of
+
+archive_table = EventArchive.__table__
+event_table = Event.__table__
+
+# Every event column but child_id is stored in a segment as an array of the same name
+ARRAY_COLUMNS = [column.name for column in event_table.columns if column.name != 'child_id']
+
+Extent = namedtuple('Extent', ['event_count', 'archived_at', 'end'])
+
+
+def oldest_month(before):
+    """Return the month of the oldest Event that started before a datetime, or None if there is none."""
+    started_at = db.session.query(func.min(Event.started_at)).filter(Event.started_at < before).scalar()
+    return month_of(started_at) if started_at is not None else None
+
+
+def archive_month(month):
+    """Move every Event that started in a month into its Child's segment for that month, returning how many moved.
+
+    Runs as a single statement, adding to any segment the month already has. Events are moved unchanged, so nothing
+    is recorded in the change feed and daily summaries are left as they are.
+    """
+    lower, upper = month_bounds(month)
+    aggregates = ', '.join('array_agg({0} ORDER BY started_at, id)'.format(name) for name in ARRAY_COLUMNS)
+    merges = ', '.join('{0} = event_archive.{0} || excluded.{0}'.format(name) for name in ARRAY_COLUMNS)
+    statement = text('WITH moved AS (DELETE FROM event WHERE started_at >= :lower AND started_at < :upper '
+                     'RETURNING *), '
+                     'archived AS (INSERT INTO event_archive (child_id, month, event_count, archived_at, {0}) '
+                     'SELECT child_id, :month, count(*), now(), {1} FROM moved GROUP BY child_id '
+                     'ON CONFLICT (child_id, month) DO UPDATE SET archived_at = excluded.archived_at, '
+                     'event_count = event_archive.event_count + excluded.event_count, {2}) '
+                     'SELECT count(*) FROM moved'.format(', '.join(ARRAY_COLUMNS), aggregates, merges))
+    return db.session.execute(statement, {'lower': lower, 'upper': upper, 'month': month}).scalar()
+
+
+def extent(child_id):
+    """Return how many of a Child's Events are archived, when their segments last changed and the end of the last
+    archived month, or None if the Child has no archived Events.
+    """
+    event_count, archived_at, month = db.session.query(
+        func.sum(EventArchive.event_count), func.max(EventArchive.archived_at), func.max(EventArchive.month)) \
+        .filter(EventArchive.child_id == str(child_id)).one()
+    if month is None:
+        return None
+    return Extent(int(event_count), archived_at, month_bounds(month)[1])
+
+
+def archived_events(child_ids=None, since=None, until=None, event_ids=None):
+    """Select archived Events as rows with the event table's columns.
+
+    Only the segments of the given Children, for months overlapping since and until, and containing any of the given
+    Event IDs are expanded. Every Event in those segments is returned, so filter the rows as well.
+    """
+    query = select([archive_table.c.child_id if column.name == 'child_id' else
+                    func.unnest(archive_table.c[column.name], type_=column.type).label(column.name)
+                    for column in event_table.columns])
+    if child_ids is not None:
+        query = query.where(archive_table.c.child_id.in_(child_ids))
+    if since is not None:
+        query = query.where(archive_table.c.month >= month_of(since))
+    if until is not None:
+        query = query.where(archive_table.c.month <= month_of(until))
+    if event_ids is not None:
+        query = query.where(archive_table.c.id.overlap(cast(array(event_ids), ARRAY(UUID))))
+    return query
+
+
+def all_events(child_ids=None, since=None, until=None):
+    """Select current and archived Events together, as an alias with the event table's columns.
+
+    PostgreSQL applies filters on the alias to both halves, so they still use the event table's indexes.
+    """
+    current = select(list(event_table.columns))
+    if child_ids is not None:
+        current = current.where(event_table.c.child_id.in_(child_ids))
+    return current.union_all(archived_events(child_ids, since, until)).alias('all_event')
+
+
+def find_events(child_id, event_ids):
+    """Load the given archived Events of a Child, as Event instances that must not be changed."""
+    event_ids = [str(event_id) for event_id in event_ids]
+    if not event_ids:
+        return []
+
+    # The archived columns only share their names with the event table's, so map them by name
+    archived = aliased(Event, archived_events([str(child_id)], event_ids=event_ids).alias('archived_event'),
+                       adapt_on_names=True)
+    return db.session.query(archived).filter(archived.id.in_(event_ids)).all()
+
+
+def restore(child_id, event_id):
+    """Move an archived Event back into the event table, so it can be changed. Returns whether it was archived."""
+    parameters = {'child_id': str(child_id), 'event_id': str(event_id)}
+
+    # Lock the segment, so a concurrent restore of the same Event waits and then finds it gone
+    segment = db.session.execute(text('SELECT month FROM event_archive WHERE child_id = :child_id '
+                                      'AND id @> ARRAY[CAST(:event_id AS uuid)] FOR UPDATE'), parameters).first()
+    if segment is None:
+        return False
+
+    archived = archived_events([str(child_id)], event_ids=[str(event_id)]).alias('archived_event')
+    event = select(list(archived.c)).where(archived.c.id == str(event_id))
+    db.session.execute(event_table.insert().from_select([column.name for column in event_table.columns], event))
+
+    # Every expression sees the segment's arrays as they were, so each loses the element at the same position
+    slices = ', '.join('{0} = {0}[1:array_position(id, CAST(:event_id AS uuid)) - 1] || '
+                       '{0}[array_position(id, CAST(:event_id AS uuid)) + 1:]'.format(name) for name in ARRAY_COLUMNS)
+    db.session.execute(text('UPDATE event_archive SET event_count = event_count - 1, archived_at = now(), {0} '
+                            'WHERE child_id = :child_id AND month = :month'.format(slices)),
+                       dict(parameters, month=segment.month))
+    db.session.execute(text('DELETE FROM event_archive WHERE child_id = :child_id AND month = :month '
+                            'AND event_count = 0'), dict(parameters, month=segment.month))
+    return True
+
+
+def forget_user(child_ids, user_id):
+    """Remove a User from the given Children's archived Events, marking those Events as updated."""
+    if not child_ids:
+        return
+
+    # Both arrays are read as they were, so each Event's updated_at is matched with the user_id it had
+    db.session.execute(text('UPDATE event_archive SET archived_at = now(), '
+                            'updated_at = ARRAY(SELECT CASE WHEN archived_user_id = CAST(:user_id AS uuid) THEN now() '
+                            'ELSE archived_updated_at END FROM unnest(user_id, updated_at) WITH ORDINALITY '
+                            'AS archived (archived_user_id, archived_updated_at, position) ORDER BY position), '
+                            'user_id = array_replace(user_id, CAST(:user_id AS uuid), NULL) '
+                            'WHERE child_id = ANY(CAST(:child_ids AS uuid[])) '
+                            'AND CAST(:user_id AS uuid) = ANY(user_id)'),
+                       {'child_ids': [str(child_id) for child_id in child_ids], 'user_id': str(user_id)})
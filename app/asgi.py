@@ -0,0 +1,201 @@
+import asyncio
+import re
+import uuid
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import asyncpg
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag
+
+from app import encoder
+from app.conditional import make_etag, validators_match
+from app.models import Child, Event, User, isoformat
+
+UUID = '[A-Fa-f0-9]{8}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{4}-[A-Fa-f0-9]{12}'
+
+USER_QUERY = """
+    SELECT id::text, first_name, last_name, email_address, activated_at, login_at, created_at, updated_at,
+           array(SELECT child_id::text FROM user_child WHERE user_id = user_account.id) AS child_ids
+    FROM user_account
+    WHERE id = $1
+"""
+
+CHILD_COLUMNS = """
+    child.id::text, child.first_name, child.last_name, child.date_of_birth, child.created_at, child.updated_at,
+    array(SELECT guardian.user_id::text FROM user_child AS guardian WHERE guardian.child_id = child.id) AS user_ids
+"""
+
+CHILD_QUERY = "SELECT {0} FROM child WHERE child.id = $1".format(CHILD_COLUMNS)
+
+CHILDREN_QUERY = """
+    SELECT {0}
+    FROM child JOIN user_child ON user_child.child_id = child.id
+    WHERE user_child.user_id = $1
+""".format(CHILD_COLUMNS)
+
+EVENT_QUERY = """
+    SELECT id::text, user_id::text, child_id::text, type, feed_type, change_type, started_at, ended_at, amount, unit,
+           side, notes, created_at, updated_at
+    FROM event
+    WHERE id = $1
+"""
+
+
+class AsyncApp(object):
+    """Serves the busiest read routes on asyncio with asyncpg, handing every other request to the Flask app.
+
+    The async handlers only ever answer 200 or 304. A missing record, an unacceptable Accept header or anything
+    else unusual is passed to the Flask view, so errors and every other route behave exactly as under WSGI.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self._pool = None
+        self.routes = [
+            (re.compile('^/v1/users/({0})$'.format(UUID)), self.get_user),
+            (re.compile('^/v1/children$'), self.get_children),
+            (re.compile('^/v1/children/({0})$'.format(UUID)), self.get_child),
+            (re.compile('^/v1/children/({0})/events/({0})$'.format(UUID)), self.get_event),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            request = Request(scope)
+            for pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match and request.accepts('application/json'):
+                    response = await handler(request, *[uuid.UUID(arg) for arg in match.groups()])
+                    if response is not None:
+                        return await response.send(send)
+                    break
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.pool()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def pool(self):
+        """Return the connection pool, creating it on first use with the same DATABASE_* settings as the WSGI app."""
+        if self._pool is None:
+            config = self.flask_app.config
+            server_settings = {'application_name': config['DATABASE_APPLICATION_NAME']}
+            if config['DATABASE_STATEMENT_TIMEOUT'] and not config['DATABASE_PGBOUNCER']:
+                server_settings['statement_timeout'] = str(config['DATABASE_STATEMENT_TIMEOUT'])
+
+            # PgBouncer in transaction mode cannot keep prepared statements between transactions, so turn off
+            # asyncpg's statement cache
+            self._pool = asyncio.ensure_future(asyncpg.create_pool(
+                config['SQLALCHEMY_DATABASE_URI'],
+                min_size=1,
+                max_size=config['DATABASE_POOL_SIZE'] + config['DATABASE_MAX_OVERFLOW'],
+                timeout=config['DATABASE_CONNECT_TIMEOUT'],
+                statement_cache_size=0 if config['DATABASE_PGBOUNCER'] else 100,
+                server_settings=server_settings))
+        return await self._pool
+
+    async def close(self):
+        if self._pool is not None:
+            await (await self._pool).close()
+            self._pool = None
+
+    async def get_user(self, request, user_id):
+        row = await (await self.pool()).fetchrow(USER_QUERY, user_id)
+        if row is None:
+            return None
+
+        body = encoder.dumps(User.as_dict(_record(row), child_ids=row['child_ids']))
+        return JSONResponse.conditional(request, body, make_etag(body))
+
+    async def get_children(self, request):
+        user_id = request.args.get('user_id')
+        if user_id is None or not re.match('^{0}$'.format(UUID), user_id):
+            return None
+
+        user_id = uuid.UUID(user_id)
+        async with (await self.pool()).acquire() as connection:
+            rows = await connection.fetch(CHILDREN_QUERY, user_id)
+            if not rows and await connection.fetchval("SELECT 1 FROM user_account WHERE id = $1", user_id) is None:
+                return None
+
+        result = []
+        for row in rows:
+            result.append(Child.as_dict(_record(row), user_ids=row['user_ids']))
+        return JSONResponse(encoder.dumps(result))
+
+    async def get_child(self, request, child_id):
+        row = await (await self.pool()).fetchrow(CHILD_QUERY, child_id)
+        if row is None:
+            return None
+
+        body = encoder.dumps(Child.as_dict(_record(row), user_ids=row['user_ids']))
+        return JSONResponse.conditional(request, body, make_etag(body))
+
+    async def get_event(self, request, child_id, event_id):
+        row = await (await self.pool()).fetchrow(EVENT_QUERY, event_id)
+        if row is None:
+            return None
+
+        last_modified = row['updated_at'] or row['created_at']
+        etag = make_etag(row['id'], isoformat(last_modified))
+        return JSONResponse.conditional(request, encoder.dumps(Event.as_dict(_record(row))), etag, last_modified)
+
+
+def _record(row):
+    # The models' as_dict methods only read attributes, so calling them on a row keeps both modes' JSON identical
+    return SimpleNamespace(**row)
+
+
+class Request(object):
+    """The parts of an ASGI HTTP request the async handlers need."""
+
+    def __init__(self, scope):
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.args = {name: values[0] for name, values in parse_qs(scope['query_string'].decode('latin-1')).items()}
+
+    def accepts(self, mimetype):
+        # As flask_negotiate's produces decorator, which only accepts exact media types
+        return mimetype in parse_accept_header(self.headers.get('accept'), MIMEAccept).values()
+
+
+class JSONResponse(object):
+    def __init__(self, body, status=200, headers=None):
+        self.body = body.encode('UTF-8')
+        self.status = status
+        self.headers = headers or []
+
+    @classmethod
+    def conditional(cls, request, body, etag, last_modified=None):
+        """Return an empty 304 response if the request's validators match, otherwise the body with its validators."""
+        headers = [('ETag', quote_etag(etag))]
+        if validators_match(parse_etags(request.headers.get('if-none-match')),
+                            parse_date(request.headers.get('if-modified-since')), etag, last_modified):
+            return cls('', status=304, headers=headers)
+
+        if last_modified is not None:
+            headers.append(('Last-Modified', http_date(last_modified.timestamp())))
+        return cls(body, headers=headers)
+
+    async def send(self, send):
+        headers = self.headers + [('Content-Length', str(len(self.body)))]
+        if self.status != 304:
+            headers.append(('Content-Type', 'application/json'))
+        await send({
+            'type': 'http.response.start',
+            'status': self.status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': self.body})
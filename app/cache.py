@@ -0,0 +1,134 @@
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from app.replicas import read_replica
+
+
+class NullCache(object):
+    """A backend that stores nothing, so every read goes to the database."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class SimpleCache(object):
+    """An in-process LRU backend with per-entry expiry. Only correct when the API runs in a single process."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisCache(object):
+    """A backend for any server speaking the Redis protocol, shared by every API process."""
+
+    def __init__(self, client=None, url=None, prefix='diary:'):
+        if client is None:
+            import redis
+            client = redis.StrictRedis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('UTF-8') if value is not None else None
+
+    def set(self, key, value, timeout):
+        self.client.set(self.prefix + key, value.encode('UTF-8'), ex=timeout)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class CacheEntry(object):
+    """A cached value pinned to the version of its namespace that was current when the entry was looked up.
+
+    Looking up the version before reading the database means a value computed from data that is invalidated
+    part-way through is stored under the old version, where it can never be read.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+
+    def get(self):
+        return self.cache.backend.get(self.key)
+
+    def set(self, value):
+        timeout = self.cache.timeout
+        if read_replica() is not None:
+            # A value read from a replica may predate the latest invalidation, so only keep it as long as the
+            # replica is allowed to lag
+            timeout = min(timeout, self.cache.replica_timeout)
+        self.cache.backend.set(self.key, value, timeout)
+
+
+class Cache(object):
+    """Read-through cache of serialized responses, grouped into namespaces that are invalidated as a whole."""
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.timeout = 300
+        self.replica_timeout = 5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config['CACHE_TYPE']
+        if cache_type == 'null':
+            self.backend = NullCache()
+        elif cache_type == 'simple':
+            self.backend = SimpleCache(max_entries=app.config['CACHE_MAX_ENTRIES'])
+        elif cache_type == 'redis':
+            self.backend = RedisCache(url=app.config['CACHE_REDIS_URL'])
+        else:
+            raise ValueError("Unknown CACHE_TYPE '{0}'".format(cache_type))
+        self.timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        self.replica_timeout = max(1, int(math.ceil(app.config['DATABASE_REPLICA_MAX_LAG'])))
+
+    def entry(self, namespace, key):
+        """Return the entry for key in the current version of namespace."""
+        version_key = 'version:' + namespace
+        version = self.backend.get(version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            self.backend.set(version_key, version, self.timeout)
+        return CacheEntry(self, '{0}:{1}:{2}'.format(namespace, version, key))
+
+    def invalidate(self, *namespaces):
+        """Make every entry in the given namespaces unreachable."""
+        for namespace in set(namespaces):
+            self.backend.delete('version:' + namespace)
@@ -0,0 +1,90 @@
+from datetime import datetime
+
+from sqlalchemy import func, literal, select, tuple_
+
+from app import archive, db, notifier
+from app.models import Event, EventChange, isoformat
+
+change_table = EventChange.__table__
+
+
+def record(child_id, event_ids, operation):
+    """Append a change to a Child's feed for each of the given Events, as part of the current transaction."""
+    if not event_ids:
+        return
+
+    created_at = datetime.utcnow()
+    db.session.execute(change_table.insert().values([
+        {'child_id': str(child_id), 'event_id': str(event_id), 'operation': operation, 'created_at': created_at}
+        for event_id in event_ids
+    ]))
+    notifier.notify(child_id)
+
+
+def record_matching(child_ids, criterion, operation, events=Event.__table__):
+    """Append a change for every Event of the given Children that matches criterion, with one INSERT ... SELECT.
+
+    Events are read from the event table, or from another selectable of Events such as the archived ones.
+    """
+    if not child_ids:
+        return
+
+    events = select([events.c.child_id, events.c.id, literal(operation), literal(datetime.utcnow())]) \
+        .where(events.c.child_id.in_(child_ids)).where(criterion)
+    db.session.execute(change_table.insert().from_select(['child_id', 'event_id', 'operation', 'created_at'], events))
+    for child_id in child_ids:
+        notifier.notify(child_id)
+
+
+def changes_since(child_id, position, limit):
+    """Return up to limit of a Child's changes after position, with the position to read from next.
+
+    Changes are ordered by the transaction that made them, and only returned once every older transaction has
+    finished, so a change that commits after a later one has been read is still found from the later position.
+    The position is a (transaction_id, change_id) pair, or None for the start of the feed.
+    """
+    horizon = _horizon()
+    query = db.session.query(EventChange, Event) \
+                      .outerjoin(Event, Event.id == EventChange.event_id) \
+                      .filter(EventChange.child_id == str(child_id), EventChange.transaction_id < horizon)
+    if position is not None:
+        query = query.filter(tuple_(EventChange.transaction_id, EventChange.id) > tuple_(*position))
+    rows = query.order_by(EventChange.transaction_id, EventChange.id).limit(limit).all()
+
+    if len(rows) == limit:
+        position = (rows[-1][0].transaction_id, rows[-1][0].id)
+    else:
+        # Every visible change has been read, so skip ahead to the oldest transaction that may still commit one
+        position = max(position or (0, 0), (horizon, 0))
+
+    # Archived Events have left the event table but not been deleted
+    archived = archive.find_events(child_id, set(change.event_id for change, event in rows if event is None))
+    archived = dict((event.id, event) for event in archived)
+    rows = [(change, event if event is not None else archived.get(change.event_id)) for change, event in rows]
+
+    # Report each Event once, in its current state, as of its latest change
+    changes = {}
+    for change, event in rows:
+        changes.pop(change.event_id, None)
+        changes[change.event_id] = {
+            "event_id": change.event_id,
+            "operation": change.operation if event is not None else 'deleted',
+            "event": event.as_dict() if event is not None else None,
+            "changed_at": isoformat(change.created_at)
+        }
+    return list(changes.values()), position
+
+
+def head():
+    """Return the position after every change that has been committed so far."""
+    return _horizon(), 0
+
+
+def prune(cutoff):
+    """Delete changes made before cutoff, returning how many were deleted."""
+    return EventChange.query.filter(EventChange.created_at < cutoff).delete(synchronize_session=False)
+
+
+def _horizon():
+    # Transactions older than the snapshot's xmin have all finished, so no change below it can appear later
+    return db.session.execute(select([func.txid_snapshot_xmin(func.txid_current_snapshot())])).scalar()
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta, timezone
+
+import click
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app import app, archive, cache, changes, db, jobs, partitions, summaries
+from app.accounts import export_accounts, import_accounts
+from app.idempotency import prune_idempotency_keys
+from app.models import Job, RevokedToken
+
+
+@app.cli.command('prune-idempotency-keys')
+def prune_idempotency_keys_command():
+    """Delete Idempotency-Keys older than IDEMPOTENCY_KEY_TTL."""
+    count = prune_idempotency_keys()
+    click.echo('Deleted {0} expired idempotency keys'.format(count))
+
+
+@app.cli.command('prune-revoked-tokens')
+def prune_revoked_tokens_command():
+    """Delete revoked refresh tokens that have expired anyway."""
+    count = RevokedToken.query.filter(RevokedToken.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo('Deleted {0} expired revoked tokens'.format(count))
+
+
+@app.cli.command('rebuild-daily-summaries')
+def rebuild_daily_summaries_command():
+    """Recompute every Child's daily summary from their Events."""
+    summaries.rebuild()
+    db.session.commit()
+    click.echo('Rebuilt daily summaries')
+
+
+@app.cli.command('prune-event-changes')
+def prune_event_changes_command():
+    """Delete change feed entries older than CHANGE_FEED_RETENTION."""
+    # Keep an extra day, as the changes after a cursor can be made shortly before it is issued, by transactions that
+    # were still running at the time
+    count = changes.prune(datetime.utcnow() - app.config['CHANGE_FEED_RETENTION'] - timedelta(days=1))
+    db.session.commit()
+    click.echo('Deleted {0} event changes'.format(count))
+
+
+@app.cli.command('maintain-event-partitions')
+@click.option('--months-ahead', type=int, help='Months after this one to create partitions for.')
+@click.option('--retention-months', type=int,
+              help='Archive and detach partitions older than this many months. 0 keeps all.')
+def maintain_event_partitions_command(months_ahead, retention_months):
+    """Create event partitions for the coming months, and archive and detach those older than the retention period."""
+    if months_ahead is None:
+        months_ahead = app.config['EVENT_PARTITION_MONTHS_AHEAD']
+    if retention_months is None:
+        retention_months = app.config['EVENT_PARTITION_RETENTION_MONTHS']
+    current = partitions.month_of(datetime.now(timezone.utc))
+    cutoff = partitions.add_months(current, -retention_months) if retention_months > 0 else None
+    failures = 0
+
+    # Commit each partition separately, so the locks they take are held briefly and one that fails leaves the rest to
+    # be maintained
+    for month in partitions.missing_partitions(partitions.add_months(current, months_ahead), since=cutoff):
+        try:
+            name = partitions.create_partition(month)
+            db.session.commit()
+        except SQLAlchemyError as error:
+            db.session.rollback()
+            failures += 1
+            click.echo('Failed to create partition for {0:%Y-%m}: {1}'.format(month, str(error).splitlines()[0]),
+                       err=True)
+            continue
+        click.echo('Created partition {0}'.format(name))
+
+    if cutoff is not None:
+        # Events past retention in the default partition, such as restored or backdated ones, are archived as well
+        attached = partitions.partition_months()
+        for month in sorted(set(attached + partitions.stranded_months())):
+            if month >= cutoff:
+                continue
+            try:
+                # Archive the month's Events first, so they are still served and no partition is detached with any
+                count = archive.archive_month(month)
+                name = partitions.detach_partition(month) if month in attached else None
+                db.session.commit()
+            except (SQLAlchemyError, ValueError) as error:
+                db.session.rollback()
+                failures += 1
+                click.echo('Failed to archive {0:%Y-%m}: {1}'.format(month, str(error).splitlines()[0]),
+                           err=True)
+                continue
+            click.echo('Archived {0} events from {1:%Y-%m}'.format(count, month))
+            if name is not None:
+                click.echo('Detached partition {0}'.format(name))
+
+    if failures:
+        raise click.ClickException('{0} partition maintenance steps failed'.format(failures))
+
+
+@app.cli.command('archive-events')
+@click.option('--after-days', type=int, help='Archive events that started more than this many days ago.')
+def archive_events_command(after_days):
+    """Move old Events into the compressed archive, a calendar month at a time."""
+    if after_days is None:
+        after_days = app.config['EVENT_ARCHIVE_AFTER_DAYS']
+
+    # Only whole months are archived, so the month containing the cutoff stays until it has all passed it
+    before = partitions.month_bounds(partitions.month_of(datetime.now(timezone.utc) - timedelta(days=after_days)))[0]
+
+    # Commit each month separately, so no transaction holds more than a month of deleted Events. Archived Events
+    # read back unchanged, so cached pages of Events stay valid
+    month = archive.oldest_month(before)
+    while month is not None:
+        count = archive.archive_month(month)
+        db.session.commit()
+        click.echo('Archived {0} events from {1:%Y-%m}'.format(count, month))
+        month = archive.oldest_month(before)
+
+
+@app.cli.command('run-pending-jobs')
+def run_pending_jobs_command():
+    """Run background Jobs that were queued by a process that stopped before starting them."""
+    job_ids = [job_id for job_id, in db.session.query(Job.id).filter(Job.status == 'pending').order_by(Job.created_at)]
+    count = sum(jobs.run(job_id) for job_id in job_ids)
+    click.echo('Ran {0} pending jobs'.format(count))
+
+
+@app.cli.command('export-accounts')
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--user-id', 'user_ids', multiple=True, help='Only export this User and their Children. Repeatable.')
+def export_accounts_command(output, user_ids):
+    """Write Users, Children and Events to OUTPUT with COPY, for import-accounts."""
+    counts = export_accounts(output, user_ids or None)
+    db.session.commit()
+    click.echo(', '.join('{0} {1} rows'.format(count, name) for name, count in counts.items()), err=True)
+
+
+@app.cli.command('import-accounts')
+@click.argument('input', type=click.File('rb'), default='-')
+def import_accounts_command(input):
+    """Add the Users, Children and Events in INPUT, written by export-accounts, keeping their IDs."""
+    try:
+        counts, namespaces = import_accounts(input)
+        db.session.commit()
+    except (IntegrityError, ValueError) as error:
+        db.session.rollback()
+        raise click.ClickException(str(error).splitlines()[0])
+
+    cache.invalidate(*namespaces)
+    click.echo('Imported ' + ', '.join('{0} {1} rows'.format(count, name) for name, count in counts.items()))
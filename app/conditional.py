@@ -0,0 +1,44 @@
+import hashlib
+from datetime import timezone
+
+from flask import Response, request
+
+
+def make_etag(*parts):
+    """Build a strong entity tag from the parts that identify a version of a representation."""
+    return hashlib.sha1('\n'.join(str(part) for part in parts).encode('UTF-8')).hexdigest()
+
+
+def is_not_modified(etag, last_modified=None):
+    """Check the request's conditional headers against the current version, as in RFC 7232 section 6."""
+    return validators_match(request.if_none_match, request.if_modified_since, etag, last_modified)
+
+
+def validators_match(if_none_match, if_modified_since, etag, last_modified=None):
+    """Check parsed If-None-Match and If-Modified-Since headers against the current version."""
+    if if_none_match:
+        return if_none_match.contains(etag)
+
+    if last_modified is not None and if_modified_since is not None:
+        return _utc(last_modified).replace(microsecond=0) <= _utc(if_modified_since)
+
+    return False
+
+
+def not_modified(etag, last_modified=None):
+    """Return an empty 304 response carrying the current validators."""
+    return set_validators(Response(status=304), etag, last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add ETag and, where known, Last-Modified headers to a response."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _utc(last_modified)
+    return response
+
+
+def _utc(value):
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,97 @@
+import threading
+from collections import Counter
+from functools import partial
+
+import flask_sqlalchemy
+from sqlalchemy import event, orm
+from sqlalchemy.pool import NullPool
+
+from app.replicas import read_replica
+
+
+class PoolMetrics(object):
+    """Counts each engine's connection pool events, alongside the gauges the pool keeps itself."""
+
+    events = ('connect', 'checkout', 'checkin', 'invalidate')
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def register(self, engine):
+        counts = Counter()
+        with self._lock:
+            self._counts[engine] = counts
+        for name in self.events:
+            event.listen(engine.pool, name, partial(self._count, counts, name))
+
+    def as_dict(self, engine):
+        with self._lock:
+            counts = self._counts.get(engine, Counter())
+            result = {name: counts[name] for name in self.events}
+
+        pool = engine.pool
+        result["pool"] = type(pool).__name__
+        for gauge in ('size', 'checkedin', 'checkedout', 'overflow'):
+            result[gauge] = getattr(pool, gauge)() if hasattr(pool, gauge) else None
+        return result
+
+    def _count(self, counts, name, *args):
+        with self._lock:
+            counts[name] += 1
+
+
+class RoutingSession(flask_sqlalchemy.SignallingSession):
+    """Sends queries from read-only views to the replica chosen for the request, and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        replica = read_replica()
+        if replica is not None and not self._flushing:
+            return replica
+        return super().get_bind(mapper, clause)
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """Flask-SQLAlchemy with its engine configured from the DATABASE_* settings, and pool metrics."""
+
+    def __init__(self, *args, **kwargs):
+        self.pool_metrics = PoolMetrics()
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        super().apply_driver_hacks(app, sa_url, options)
+        config = app.config
+
+        connect_args = options.setdefault('connect_args', {})
+        connect_args['application_name'] = config['DATABASE_APPLICATION_NAME']
+        connect_args['connect_timeout'] = config['DATABASE_CONNECT_TIMEOUT']
+
+        if config['DATABASE_PGBOUNCER']:
+            # PgBouncer pools server connections itself and, in transaction mode, hands each transaction to any
+            # of them, so hold no connections here and keep no session state such as startup options
+            options['poolclass'] = NullPool
+        else:
+            options['pool_size'] = config['DATABASE_POOL_SIZE']
+            options['max_overflow'] = config['DATABASE_MAX_OVERFLOW']
+            options['pool_timeout'] = config['DATABASE_POOL_TIMEOUT']
+            options['pool_recycle'] = config['DATABASE_POOL_RECYCLE']
+            options['pool_pre_ping'] = config['DATABASE_POOL_PRE_PING']
+            if config['DATABASE_STATEMENT_TIMEOUT']:
+                connect_args['options'] = '-c statement_timeout={0}'.format(config['DATABASE_STATEMENT_TIMEOUT'])
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        config = self.get_app().config
+
+        if config['DATABASE_PGBOUNCER'] and config['DATABASE_STATEMENT_TIMEOUT']:
+            event.listen(engine, 'begin', partial(_set_local_statement_timeout, config['DATABASE_STATEMENT_TIMEOUT']))
+
+        self.pool_metrics.register(engine)
+        return engine
+
+
+def _set_local_statement_timeout(timeout, connection):
+    connection.execute('SET LOCAL statement_timeout = {0:d}'.format(timeout))
@@ -0,0 +1,52 @@
+import json
+import time
+
+from flask import g, has_request_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib_dumps(value):
+    """Serialize with the standard library, with sorted keys and no whitespace."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'))
+
+
+def orjson_dumps(value):
+    """Serialize with orjson, with sorted keys and no whitespace."""
+    return orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode('UTF-8')
+
+
+class Encoder(object):
+    """Serializes response bodies with the JSON library selected by JSON_ENCODER, timing it for each request."""
+
+    def __init__(self, app=None):
+        self.backend = stdlib_dumps
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        encoder = app.config['JSON_ENCODER']
+        if encoder == 'auto':
+            encoder = 'orjson' if orjson is not None else 'json'
+
+        if encoder == 'json':
+            self.backend = stdlib_dumps
+        elif encoder == 'orjson':
+            if orjson is None:
+                raise ValueError("JSON_ENCODER is 'orjson' but orjson is not installed")
+            self.backend = orjson_dumps
+        else:
+            raise ValueError("Unknown JSON_ENCODER '{0}'".format(encoder))
+
+    def dumps(self, value):
+        if not has_request_context():
+            return self.backend(value)
+
+        started = time.perf_counter()
+        try:
+            return self.backend(value)
+        finally:
+            g.serialization_seconds = g.get('serialization_seconds', 0.0) + time.perf_counter() - started
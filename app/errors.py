@@ -1,13 +1,11 @@
-import json
-
 from flask import Response
 from werkzeug.exceptions import HTTPException
 
-from app import app
+from app import app, encoder
 
 
 @app.errorhandler(HTTPException)
 def bad_request(error):
-    return Response(response=json.dumps({"description": error.description}, separators=(',', ':')),
+    return Response(response=encoder.dumps({"description": error.description}),
                     mimetype='application/json',
                     status=error.code)
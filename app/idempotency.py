@@ -0,0 +1,102 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, current_app, request
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import BadRequest, Conflict, UnprocessableEntity
+
+from app import db
+from app.models import IdempotencyKey
+
+
+def idempotent(view):
+    """Replay the stored response when a request is retried with the same Idempotency-Key header.
+
+    The key is claimed before the view runs, so a concurrent retry gets a 409 rather than creating a duplicate. If the
+    view fails the claim is released so the client can retry once the problem is fixed. A claim still in progress after
+    IDEMPOTENCY_CLAIM_LEASE is taken as abandoned by a worker that died, and a retry takes it over.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view(*args, **kwargs)
+
+        if not 0 < len(key) <= 255:
+            raise BadRequest("'Idempotency-Key' must be between 1 and 255 characters")
+
+        request_line = request.method.encode('UTF-8') + b' ' + request.path.encode('UTF-8')
+        fingerprint = hashlib.sha256(request_line + b'\n' + request.get_data()).hexdigest()
+
+        now = datetime.utcnow()
+        cutoff = now - current_app.config['IDEMPOTENCY_KEY_TTL']
+        lease_cutoff = now - current_app.config['IDEMPOTENCY_CLAIM_LEASE']
+        abandoned = and_(IdempotencyKey.status.is_(None), IdempotencyKey.created_at < lease_cutoff)
+        record, expired, stale = db.session.query(IdempotencyKey, IdempotencyKey.created_at < cutoff, abandoned) \
+                                           .filter(IdempotencyKey.key == key).first() or (None, False, False)
+        if expired:
+            db.session.delete(record)
+            db.session.commit()
+            record = None
+
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                raise UnprocessableEntity("'Idempotency-Key' has already been used for a different request")
+            if record.status is not None:
+                return _replay(record)
+            if not stale:
+                raise Conflict("A request with this 'Idempotency-Key' is still in progress")
+
+        # Claim the key before doing any work. The claim time identifies this claim, so a request whose claim was taken
+        # over neither stores its response nor releases the new claim
+        claim = IdempotencyKey(key=key, fingerprint=fingerprint)
+        claimed_at = claim.created_at
+        if record is None:
+            try:
+                db.session.add(claim)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                raise Conflict("A request with this 'Idempotency-Key' is still in progress")
+        else:
+            taken = IdempotencyKey.query.filter(IdempotencyKey.key == key, abandoned) \
+                                        .update({'created_at': claimed_at}, synchronize_session=False)
+            db.session.commit()
+            if not taken:
+                raise Conflict("A request with this 'Idempotency-Key' is still in progress")
+
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(key=key, created_at=claimed_at).delete()
+            db.session.commit()
+            raise
+
+        # Store the response for replay
+        IdempotencyKey.query.filter_by(key=key, created_at=claimed_at) \
+                            .update({'status': response.status_code,
+                                     'response': response.get_data(as_text=True),
+                                     'location': response.headers.get('Location')}, synchronize_session=False)
+        db.session.commit()
+
+        return response
+    return wrapper
+
+
+def prune_idempotency_keys():
+    """Delete every Idempotency-Key older than the configured TTL, returning the number deleted."""
+    cutoff = datetime.utcnow() - current_app.config['IDEMPOTENCY_KEY_TTL']
+    count = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def _replay(record):
+    response = Response(response=record.response, mimetype='application/json', status=record.status)
+    if record.location is not None:
+        response.headers["Location"] = record.location
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
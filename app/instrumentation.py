@@ -0,0 +1,122 @@
+import logging
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Buckets for counts of SQL statements per request
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, float('inf'))
+
+
+class Instrumentation(object):
+    """Records latency, SQL statements and serialization time for each route, and logs slow SQL statements."""
+
+    def __init__(self, app=None, db=None):
+        self.registry = CollectorRegistry()
+        self.request_duration = Histogram(
+            'diary_request_duration_seconds', 'Time taken to handle a request',
+            ['method', 'route', 'status'], registry=self.registry)
+        self.request_statements = Histogram(
+            'diary_request_sql_statements', 'SQL statements executed to handle a request',
+            ['method', 'route'], buckets=STATEMENT_BUCKETS, registry=self.registry)
+        self.request_sql_duration = Histogram(
+            'diary_request_sql_duration_seconds', 'Time spent executing SQL to handle a request',
+            ['method', 'route'], registry=self.registry)
+        self.request_serialization_duration = Histogram(
+            'diary_request_serialization_duration_seconds', 'Time spent serializing JSON to handle a request',
+            ['method', 'route'], registry=self.registry)
+        self.slow_statements = Counter(
+            'diary_slow_sql_statements_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD',
+            ['route'], registry=self.registry)
+        self.registry.register(PoolCollector(self))
+        self.db = db
+        self.slow_query_threshold = 0.5
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.slow_query_threshold = app.config['SLOW_QUERY_THRESHOLD'] / 1000.0
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+        # Listen on every engine, so replicas are instrumented as well as the primary
+        if not event.contains(Engine, 'before_cursor_execute', self.before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+            event.listen(Engine, 'handle_error', self.handle_error)
+
+    def before_request(self):
+        g.request_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+        g.serialization_seconds = 0.0
+
+    def after_request(self, response):
+        if 'request_started' not in g:
+            return response
+
+        method, route = request.method, _route()
+        self.request_duration.labels(method, route, response.status_code).observe(
+            time.perf_counter() - g.request_started)
+        self.request_statements.labels(method, route).observe(g.sql_statements)
+        self.request_sql_duration.labels(method, route).observe(g.sql_seconds)
+        self.request_serialization_duration.labels(method, route).observe(g.serialization_seconds)
+        return response
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # A connection runs one statement at a time, so each start replaces any left by a statement that failed
+        conn.info['statement_started'] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('statement_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        route = None
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+            route = '{0} {1}'.format(request.method, _route())
+
+        if elapsed >= self.slow_query_threshold:
+            self.slow_statements.labels(route or 'none').inc()
+            logger.warning('Slow SQL statement took %.1f ms for %s: %s', elapsed * 1000, route or 'no request',
+                           statement)
+
+    def handle_error(self, exception_context):
+        # Failed statements never reach after_cursor_execute
+        if exception_context.connection is not None:
+            exception_context.connection.info.pop('statement_started', None)
+
+
+class PoolCollector(object):
+    """Exports the primary database's connection pool gauges and event counts."""
+
+    def __init__(self, instrumentation):
+        self.instrumentation = instrumentation
+
+    def collect(self):
+        db = self.instrumentation.db
+        if db is None:
+            return
+
+        pool = db.pool_metrics.as_dict(db.engine)
+        for gauge in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if pool[gauge] is not None:
+                yield GaugeMetricFamily('diary_db_pool_{0}'.format(gauge), 'Connection pool {0}'.format(gauge),
+                                        value=pool[gauge])
+        for name in db.pool_metrics.events:
+            yield CounterMetricFamily('diary_db_pool_{0}'.format(name), 'Connection pool {0} events'.format(name),
+                                      value=pool[name])
+
+
+def _route():
+    # Label by URL rule rather than path, so IDs in paths do not create a time series per record
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
@@ -0,0 +1,72 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Jobs(object):
+    """Runs long operations in the background on a pool of worker threads, recording their progress in the job table.
+
+    Jobs are queued in memory, so any left pending when a process stops are run by the `flask run-pending-jobs`
+    command.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = db
+        self.handlers = {}
+        self._executor = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+        self.app = app
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='job')
+
+    def handler(self, type):
+        """Register a function to run jobs of the given type, called with the job's subject ID."""
+        def register(function):
+            self.handlers[type] = function
+            return function
+        return register
+
+    def submit(self, job):
+        """Queue a committed job to run on a worker thread."""
+        return self._executor.submit(self._run_in_context, job.id)
+
+    def _run_in_context(self, job_id):
+        with self.app.app_context():
+            try:
+                return self.run(job_id)
+            finally:
+                self.db.session.remove()
+
+    def run(self, job_id):
+        """Run a pending job, unless another worker has already claimed it. Returns whether the job was run."""
+        from app.models import Job
+
+        claimed = Job.query.filter(Job.id == job_id, Job.status == 'pending') \
+                           .update({'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False)
+        self.db.session.commit()
+        if not claimed:
+            return False
+
+        job = Job.query.get(job_id)
+        try:
+            self.handlers[job.type](job.subject_id)
+            job.status = 'succeeded'
+        except Exception as error:
+            logger.exception('Job %s failed', job_id)
+            self.db.session.rollback()
+            job = Job.query.get(job_id)
+            job.status = 'failed'
+            job.error = str(error)
+
+        job.finished_at = datetime.utcnow()
+        self.db.session.commit()
+        return True
@@ -1,10 +1,9 @@
-import json
 import uuid
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timezone
 
-import bcrypt
-from app import db
-from sqlalchemy.dialects.postgresql import UUID
+from app import db, encoder, passwords
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 
 user_child = db.Table(
     'user_child',
@@ -14,6 +13,30 @@ user_child = db.Table(
 )
 
 
+def isoformat(value):
+    """Format a datetime in UTC, whatever the time zone of the database session that read it, or None as None."""
+    return value.astimezone(timezone.utc).isoformat() if value is not None else value
+
+
+def child_ids_by_user(user_ids):
+    """Map each of the given User IDs to the IDs of their children, read straight from user_child."""
+    return _group(user_child.c.user_id, user_child.c.child_id, user_ids)
+
+
+def user_ids_by_child(child_ids):
+    """Map each of the given Child IDs to the IDs of their users, read straight from user_child."""
+    return _group(user_child.c.child_id, user_child.c.user_id, child_ids)
+
+
+def _group(key_column, value_column, keys):
+    groups = defaultdict(list)
+    keys = [str(key) for key in keys]
+    if keys:
+        for key, value in db.session.query(key_column, value_column).filter(key_column.in_(keys)):
+            groups[str(key)].append(str(value))
+    return groups
+
+
 class User(db.Model):
     __tablename__ = 'user_account'
 
@@ -29,7 +52,7 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
     # Relationships
-    children = db.relationship('Child', secondary=user_child, lazy=False, backref=db.backref('users', lazy=True))
+    children = db.relationship('Child', secondary=user_child, lazy=True, backref=db.backref('users', lazy=True))
     events = db.relationship('Event', backref='user', lazy=True)
 
     # Methods
@@ -42,30 +65,34 @@ class User(db.Model):
         self.set_password(password)
 
     def __repr__(self):
-        return json.dumps(self.as_dict(), sort_keys=True, separators=(',', ':'))
+        return encoder.dumps(self.as_dict())
 
-    def as_dict(self):
-        child_ids = []
-        for child in self.children:
-            child_ids.append(str(child.id))
+    def as_dict(self, child_ids=None):
+        if child_ids is None:
+            child_ids = []
+            for child in self.children:
+                child_ids.append(str(child.id))
 
         return {
             "id": self.id,
             "first_name": self.first_name,
             "last_name": self.last_name,
             "email_address": self.email_address,
-            "activated_at": self.activated_at.isoformat() if self.activated_at else self.activated_at,
-            "login_at": self.login_at.isoformat() if self.login_at else self.login_at,
+            "activated_at": isoformat(self.activated_at),
+            "login_at": isoformat(self.login_at),
             "children": child_ids,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat() if self.updated_at else self.updated_at,
+            "created_at": isoformat(self.created_at),
+            "updated_at": isoformat(self.updated_at),
         }
 
     def set_password(self, password):
-        self.password = bcrypt.hashpw(password.encode('UTF-8'), bcrypt.gensalt())
+        self.password = passwords.hash(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('UTF-8'), self.password)
+        return passwords.check(password, self.password)
+
+    def password_needs_rehash(self):
+        return passwords.needs_rehash(self.password)
 
 
 class Child(db.Model):
@@ -91,12 +118,13 @@ class Child(db.Model):
         self.created_at = datetime.utcnow()
 
     def __repr__(self):
-        return json.dumps(self.as_dict(), sort_keys=True, separators=(',', ':'))
+        return encoder.dumps(self.as_dict())
 
-    def as_dict(self):
-        user_ids = []
-        for user in self.users:
-            user_ids.append(str(user.id))
+    def as_dict(self, user_ids=None):
+        if user_ids is None:
+            user_ids = []
+            for user in self.users:
+                user_ids.append(str(user.id))
 
         return {
             "id": self.id,
@@ -104,17 +132,17 @@ class Child(db.Model):
             "last_name": self.last_name,
             "date_of_birth": self.date_of_birth.isoformat(),
             "users": user_ids,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat() if self.updated_at else self.updated_at,
+            "created_at": isoformat(self.created_at),
+            "updated_at": isoformat(self.updated_at),
         }
 
 
 class Event(db.Model):
     __tablename__ = 'event'
     # Fields
-    id = db.Column(UUID, primary_key=True)
+    id = db.Column(UUID, nullable=False)
     user_id = db.Column(UUID, db.ForeignKey('user_account.id', ondelete="SET NULL"), nullable=True, index=True)
-    child_id = db.Column(UUID, db.ForeignKey('child.id', ondelete="CASCADE"), nullable=False, index=True)
+    child_id = db.Column(UUID, db.ForeignKey('child.id', ondelete="CASCADE"), nullable=False)
     type = db.Column(db.String, nullable=False)
     feed_type = db.Column(db.String, nullable=True)
     change_type = db.Column(db.String, nullable=True)
@@ -127,6 +155,15 @@ class Event(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
     updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
 
+    # Indexes
+    __table_args__ = (
+        # PostgreSQL requires the partition key in the primary key, but Events are still identified by id alone
+        db.PrimaryKeyConstraint(id, started_at),
+        db.Index('ix_event_child_id_started_at_id', child_id, started_at.desc(), id),
+        {'postgresql_partition_by': 'RANGE (started_at)'}
+    )
+    __mapper_args__ = {'primary_key': [id]}
+
     # Methods
     def __init__(self, user_id, child_id, type, started_at):
         self.id = str(uuid.uuid4())
@@ -137,7 +174,7 @@ class Event(db.Model):
         self.created_at = datetime.utcnow()
 
     def __repr__(self):
-        return json.dumps(self.as_dict(), sort_keys=True, separators=(',', ':'))
+        return encoder.dumps(self.as_dict())
 
     def as_dict(self):
         return {
@@ -147,12 +184,189 @@ class Event(db.Model):
             "type": self.type,
             "feed_type": self.feed_type,
             "change_type": self.change_type,
-            "started_at": self.started_at.isoformat(),
-            "ended_at": self.ended_at.isoformat() if self.ended_at else self.ended_at,
+            "started_at": isoformat(self.started_at),
+            "ended_at": isoformat(self.ended_at),
             "amount": self.amount,
             "unit": self.unit,
             "side": self.side,
             "notes": self.notes,
-            "created_at": self.created_at.isoformat(),
-            "updated_at": self.updated_at.isoformat() if self.updated_at else self.updated_at
+            "created_at": isoformat(self.created_at),
+            "updated_at": isoformat(self.updated_at)
+        }
+
+
+# Events in months without a partition of their own go to the default partition, until partitions.create_partition
+# moves them out
+db.event.listen(Event.__table__, 'after_create', db.DDL('CREATE TABLE event_default PARTITION OF event DEFAULT'))
+
+
+class EventArchive(db.Model):
+    __tablename__ = 'event_archive'
+
+    # Fields
+    child_id = db.Column(UUID, db.ForeignKey('child.id', ondelete="CASCADE"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    # One array per Event column, holding it for every Event in the segment in the same order, so a segment is a few
+    # large values that PostgreSQL compresses, and unnest turns back into rows
+    id = db.Column(ARRAY(UUID), nullable=False)
+    user_id = db.Column(ARRAY(UUID), nullable=False)
+    type = db.Column(ARRAY(db.String), nullable=False)
+    feed_type = db.Column(ARRAY(db.String), nullable=False)
+    change_type = db.Column(ARRAY(db.String), nullable=False)
+    started_at = db.Column(ARRAY(db.DateTime(timezone=True)), nullable=False)
+    ended_at = db.Column(ARRAY(db.DateTime(timezone=True)), nullable=False)
+    amount = db.Column(ARRAY(db.Float), nullable=False)
+    unit = db.Column(ARRAY(db.String), nullable=False)
+    side = db.Column(ARRAY(db.String), nullable=False)
+    notes = db.Column(ARRAY(db.String), nullable=False)
+    created_at = db.Column(ARRAY(db.DateTime(timezone=True)), nullable=False)
+    updated_at = db.Column(ARRAY(db.DateTime(timezone=True)), nullable=False)
+
+    # Methods
+    def __repr__(self):
+        return '<EventArchive {0} {1}>'.format(self.child_id, self.month)
+
+
+class ChildDailySummary(db.Model):
+    __tablename__ = 'child_daily_summary'
+
+    # Fields
+    child_id = db.Column(UUID, db.ForeignKey('child.id', ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)
+    sleep_count = db.Column(db.Integer, nullable=False, default=0)
+    sleep_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    feed_count = db.Column(db.Integer, nullable=False, default=0)
+    feed_ml = db.Column(db.Float, nullable=False, default=0)
+    feed_fl_oz = db.Column(db.Float, nullable=False, default=0)
+    change_count = db.Column(db.Integer, nullable=False, default=0)
+    change_wet = db.Column(db.Integer, nullable=False, default=0)
+    change_soiled = db.Column(db.Integer, nullable=False, default=0)
+    change_dry = db.Column(db.Integer, nullable=False, default=0)
+
+    # Methods
+    def __repr__(self):
+        return encoder.dumps(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "child_id": self.child_id,
+            "date": self.day.isoformat(),
+            "event_count": self.event_count,
+            "sleep_count": self.sleep_count,
+            "sleep_minutes": round(self.sleep_seconds / 60, 1),
+            "feed_count": self.feed_count,
+            "feed_amount": {
+                "ml": self.feed_ml,
+                "fl oz": self.feed_fl_oz
+            },
+            "change_count": self.change_count,
+            "change_types": {
+                "wet": self.change_wet,
+                "soiled": self.change_soiled,
+                "dry": self.change_dry
+            }
+        }
+
+
+class EventChange(db.Model):
+    __tablename__ = 'event_change'
+
+    # Fields
+    id = db.Column(db.BigInteger, primary_key=True)
+    transaction_id = db.Column(db.BigInteger, nullable=False, server_default=db.text('txid_current()'))
+    child_id = db.Column(UUID, db.ForeignKey('child.id', ondelete="CASCADE"), nullable=False)
+    event_id = db.Column(UUID, nullable=False)
+    operation = db.Column(db.String, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_event_change_child_id_transaction_id_id', child_id, transaction_id, id),
+    )
+
+    # Methods
+    def __repr__(self):
+        return '<EventChange {0}>'.format(self.id)
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_key'
+
+    # Fields
+    key = db.Column(db.String, primary_key=True)
+    fingerprint = db.Column(db.String, nullable=False)
+    status = db.Column(db.Integer, nullable=True)
+    response = db.Column(db.Text, nullable=True)
+    location = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    # Methods
+    def __init__(self, key, fingerprint):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.created_at = datetime.utcnow()
+
+    def __repr__(self):
+        return '<IdempotencyKey {0}>'.format(self.key)
+
+
+class RevokedToken(db.Model):
+    __tablename__ = 'revoked_token'
+
+    # Fields
+    id = db.Column(db.String, primary_key=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    # Methods
+    def __init__(self, id, expires_at):
+        self.id = id
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return '<RevokedToken {0}>'.format(self.id)
+
+
+class Job(db.Model):
+    __tablename__ = 'job'
+
+    # Fields
+    id = db.Column(UUID, primary_key=True)
+    type = db.Column(db.String, nullable=False)
+    subject_id = db.Column(UUID, nullable=False)
+    status = db.Column(db.String, nullable=False, index=True)
+    error = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    # Indexes
+    __table_args__ = (
+        db.Index('ix_job_type_subject_id', type, subject_id),
+    )
+
+    # Methods
+    def __init__(self, type, subject_id):
+        self.id = str(uuid.uuid4())
+        self.type = type
+        self.subject_id = str(subject_id)
+        self.status = 'pending'
+        self.created_at = datetime.utcnow()
+
+    def __repr__(self):
+        return encoder.dumps(self.as_dict())
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "type": self.type,
+            "subject_id": self.subject_id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": isoformat(self.created_at),
+            "started_at": isoformat(self.started_at),
+            "finished_at": isoformat(self.finished_at)
         }
@@ -0,0 +1,132 @@
+import logging
+import select
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import psycopg2
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'diary_event_change'
+
+
+class Notifier(object):
+    """Wakes requests waiting on a Child's change feed when a transaction that changes its Events commits.
+
+    With the postgres backend writers send NOTIFY, which PostgreSQL delivers at commit to a LISTEN connection in every
+    process. The local backend only wakes requests in the process that made the change, so only suits a single
+    process. Either way waiters also wake every poll interval, so a missed notification only delays them.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.backend = 'local'
+        self.listen_url = None
+        self.db = db
+        self._waiters = defaultdict(set)
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stopped = threading.Event()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.stop()
+        self.backend = app.config['CHANGE_FEED_NOTIFY']
+        if self.backend not in ('postgres', 'local'):
+            raise ValueError("Unknown CHANGE_FEED_NOTIFY '{0}'".format(self.backend))
+        self.listen_url = app.config['CHANGE_FEED_LISTEN_URL']
+        self.db = db
+
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def notify(self, child_id):
+        """Wake waiters on the Child's feed once the current transaction commits."""
+        if self.backend == 'postgres':
+            self.db.session.execute(text('SELECT pg_notify(:channel, :child_id)'),
+                                    {'channel': CHANNEL, 'child_id': str(child_id)})
+        else:
+            self.db.session().info.setdefault('changed_children', set()).add(str(child_id))
+
+    @contextmanager
+    def subscribe(self, child_id):
+        """Register for wake-ups on a Child's feed, yielding a threading.Event that is set on each change.
+
+        Subscribe before reading the feed, so a change committed between the read and the wait is not missed.
+        """
+        if self.backend == 'postgres':
+            self._start_listener()
+
+        waiter = threading.Event()
+        with self._lock:
+            self._waiters[str(child_id)].add(waiter)
+        try:
+            yield waiter
+        finally:
+            with self._lock:
+                self._waiters[str(child_id)].discard(waiter)
+                if not self._waiters[str(child_id)]:
+                    del self._waiters[str(child_id)]
+
+    def stop(self):
+        """Stop listening for notifications, closing the LISTEN connection."""
+        if self._listener is not None:
+            self._stopped.set()
+            self._listener.join()
+            self._listener = None
+
+    def _publish(self, child_ids=None):
+        with self._lock:
+            keys = self._waiters if child_ids is None else [key for key in child_ids if key in self._waiters]
+            for key in keys:
+                for waiter in self._waiters[key]:
+                    waiter.set()
+
+    def _after_commit(self, session):
+        child_ids = session.info.pop('changed_children', None)
+        if child_ids:
+            self._publish(child_ids)
+
+    def _after_rollback(self, session):
+        session.info.pop('changed_children', None)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._stopped = threading.Event()
+            if self.listen_url:
+                arguments = {'dsn': self.listen_url}
+            else:
+                arguments = self.db.engine.url.translate_connect_args(username='user', database='dbname')
+            self._listener = threading.Thread(target=self._listen, name='change-feed-listener', daemon=True,
+                                              args=(arguments, self._stopped))
+            self._listener.start()
+
+    def _listen(self, arguments, stopped):
+        while not stopped.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(**arguments)
+                connection.autocommit = True
+                connection.cursor().execute('LISTEN {0}'.format(CHANNEL))
+
+                # Notifications sent while disconnected are lost, so wake everyone to check for themselves
+                self._publish()
+                while not stopped.is_set():
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    child_ids = set(notification.payload for notification in connection.notifies)
+                    connection.notifies.clear()
+                    self._publish(child_ids)
+            except psycopg2.Error:
+                logger.warning('Change feed LISTEN connection failed, reconnecting', exc_info=True)
+                stopped.wait(1.0)
+            finally:
+                if connection is not None:
+                    connection.close()
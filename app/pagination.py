@@ -0,0 +1,79 @@
+import base64
+import json
+import re
+import uuid
+from datetime import date, datetime
+
+from werkzeug.exceptions import BadRequest
+
+from app.schemas import to_datetime
+
+# A UTC offset whose '+' was sent unencoded in a query string, so arrives as a space
+SPACE_OFFSET = re.compile(r'(T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?) (\d{2}:\d{2})$')
+
+
+def encode_cursor(started_at, event_id):
+    """Encode the sort key of the last Event on a page as an opaque cursor."""
+    key = json.dumps([started_at.isoformat(), str(event_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode('UTF-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode an opaque cursor back into a (started_at, event_id) sort key."""
+    try:
+        started_at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('UTF-8'))
+        return datetime.fromisoformat(started_at), str(uuid.UUID(event_id))
+    except (TypeError, ValueError):
+        raise BadRequest("'cursor' is not a valid cursor")
+
+
+def encode_change_cursor(position, issued_at=None):
+    """Encode a change feed position, and when it was issued, as an opaque cursor."""
+    issued_at = issued_at or datetime.utcnow()
+    key = json.dumps([position[0], position[1], issued_at.isoformat()], separators=(',', ':'))
+    return base64.urlsafe_b64encode(key.encode('UTF-8')).decode('ascii')
+
+
+def decode_change_cursor(cursor):
+    """Decode an opaque cursor back into a (transaction_id, change_id) position and the time it was issued."""
+    try:
+        transaction_id, change_id, issued_at = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))
+                                                          .decode('UTF-8'))
+        return (int(transaction_id), int(change_id)), datetime.fromisoformat(issued_at)
+    except (TypeError, ValueError):
+        raise BadRequest("'since' is not a valid cursor")
+
+
+def parse_datetime(args, name):
+    """Parse an optional ISO 8601 date-time query parameter."""
+    value = args.get(name, type=str)
+    if value is None:
+        return None
+
+    try:
+        return to_datetime(SPACE_OFFSET.sub(r'\1+\2', value))
+    except ValueError:
+        raise BadRequest("'{0}' must be an ISO 8601 date-time".format(name))
+
+
+def parse_date(args, name):
+    """Parse an optional ISO 8601 date query parameter."""
+    value = args.get(name, type=str)
+    if value is None:
+        return None
+
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest("'{0}' must be an ISO 8601 date".format(name))
+
+
+def parse_limit(args, default, maximum):
+    """Parse an optional page size query parameter."""
+    value = args.get('limit', type=str)
+    if value is None:
+        return default
+
+    if not value.isdigit() or not 0 < int(value) <= maximum:
+        raise BadRequest("'limit' must be an integer between 1 and {0}".format(maximum))
+    return int(value)
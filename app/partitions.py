@@ -0,0 +1,100 @@
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from app import db
+
+# The event table is range partitioned on started_at by calendar month in UTC, with a default partition for
+# months that have no partition of their own
+DEFAULT_PARTITION = 'event_default'
+PARTITION_NAME = re.compile(r'^event_y(\d{4})m(\d{2})$')
+
+
+def month_of(value):
+    """Return the first day of the calendar month, in UTC, containing a date or datetime."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """Return the first day of the month a number of months after the given one."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Return the start of a month and of the month after it, as UTC datetimes."""
+    upper = add_months(month, 1)
+    return (datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+            datetime(upper.year, upper.month, 1, tzinfo=timezone.utc))
+
+
+def partition_name(month):
+    return 'event_y{0:%Y}m{0:%m}'.format(month)
+
+
+def partition_months():
+    """Return the months of the event table's monthly partitions, oldest first."""
+    names = db.session.execute(text("SELECT relname FROM pg_inherits JOIN pg_class ON pg_class.oid = inhrelid "
+                                    "WHERE inhparent = 'event'::regclass"))
+    months = []
+    for name, in names:
+        match = PARTITION_NAME.match(name)
+        if match is not None:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def stranded_months():
+    """Return the months with Events in the default partition, such as those recorded long after they happened."""
+    stranded = db.session.execute(text("SELECT DISTINCT date_trunc('month', started_at AT TIME ZONE 'UTC')::date "
+                                       "FROM {0}".format(DEFAULT_PARTITION)))
+    return sorted(month for month, in stranded)
+
+
+def missing_partitions(until, since=None):
+    """Return the months that need a partition, oldest first.
+
+    These are the months from the current one to until without a partition, and any month with Events in the default
+    partition. Months before since are left out, as their Events are archived rather than given a partition.
+    """
+    months = set(month for month in stranded_months() if since is None or month >= since)
+    month = month_of(datetime.now(timezone.utc))
+    while month <= until:
+        months.add(month)
+        month = add_months(month, 1)
+    return sorted(months - set(partition_months()))
+
+
+def create_partition(month):
+    """Create the partition for a month, moving any of its Events out of the default partition."""
+    name = partition_name(month)
+    lower, upper = month_bounds(month)
+
+    # Stop new Events arriving in the default partition until the move is done, as attaching the partition fails if
+    # the default partition still has any Events for its month
+    db.session.execute(text('LOCK TABLE {0} IN EXCLUSIVE MODE'.format(DEFAULT_PARTITION)))
+    db.session.execute(text('CREATE TABLE {0} (LIKE event INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'.format(name)))
+    db.session.execute(text('WITH moved AS (DELETE FROM {0} WHERE started_at >= :lower AND started_at < :upper '
+                            'RETURNING *) INSERT INTO {1} SELECT * FROM moved'.format(DEFAULT_PARTITION, name)),
+                       {'lower': lower, 'upper': upper})
+    db.session.execute(text("ALTER TABLE event ATTACH PARTITION {0} FOR VALUES FROM ('{1}') TO ('{2}')".format(
+        name, lower.isoformat(), upper.isoformat())))
+    return name
+
+
+def detach_partition(month):
+    """Detach and drop a month's empty partition, once its Events have been archived.
+
+    Raises ValueError if the partition still has Events, as the API would no longer read them while the daily
+    summaries still counted them. The table is dropped so that its name is free, should the month ever need a
+    partition again.
+    """
+    name = partition_name(month)
+    if db.session.execute(text('SELECT EXISTS (SELECT 1 FROM {0})'.format(name))).scalar():
+        raise ValueError("Partition {0} still has events, archive them before detaching it".format(name))
+    db.session.execute(text('ALTER TABLE event DETACH PARTITION {0}'.format(name)))
+    db.session.execute(text('DROP TABLE {0}'.format(name)))
+    return name
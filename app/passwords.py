@@ -0,0 +1,59 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+
+class PasswordHasher(object):
+    """Runs bcrypt on a bounded pool of worker threads, shedding load once too many operations are waiting.
+
+    bcrypt releases the GIL while hashing, so threads hash in parallel without the cost of a process pool.
+    """
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.timeout = None
+        self._executor = None
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+        workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE_DEPTH'])
+
+    def hash(self, password):
+        """Hash a password with the configured work factor."""
+        return self._run(bcrypt.hashpw, password.encode('UTF-8'), bcrypt.gensalt(self.rounds))
+
+    def check(self, password, hashed):
+        """Check a password against a hash."""
+        return self._run(bcrypt.checkpw, password.encode('UTF-8'), bytes(hashed))
+
+    def needs_rehash(self, hashed):
+        """Check whether a hash was made with a different work factor to the one configured."""
+        return int(bytes(hashed).split(b'$')[2]) != self.rounds
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable('Too many password operations in progress, please try again')
+
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise ServiceUnavailable('Timed out waiting for a password operation, please try again')
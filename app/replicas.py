@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
+
+# Cookie telling read-only views to use the primary, so clients read their own writes
+STICKY_COOKIE = 'diary_read_primary'
+
+# Seconds a replica is behind the primary, or 0 when it has replayed everything it has received
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replicas(object):
+    """Chooses a read replica for read-only views, skipping replicas that are unreachable or lagging."""
+
+    def __init__(self, app=None, db=None):
+        self.db = db
+        self.keys = []
+        self._lag = {}
+        self._checking = set()
+        self._probes = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.keys = ['replica-{0}'.format(index) for index in range(len(app.config['DATABASE_REPLICA_URLS']))]
+        self.max_lag = app.config['DATABASE_REPLICA_MAX_LAG']
+        self.check_interval = app.config['DATABASE_REPLICA_CHECK_INTERVAL']
+        self.sticky_seconds = app.config['DATABASE_REPLICA_STICKY_SECONDS']
+        self.check_timeout = app.config['DATABASE_REPLICA_CHECK_TIMEOUT']
+        with self._lock:
+            self._lag = {}
+            self._checking = set()
+
+        # Lag is checked on connections of its own with a short timeout, so an unreachable replica or an exhausted
+        # pool holds up the one request checking it for seconds rather than waiting on the request pool
+        self._probes = {key: create_engine(url, poolclass=NullPool, connect_args={
+            'connect_timeout': self.check_timeout, 'application_name': app.config['DATABASE_APPLICATION_NAME']})
+            for key, url in zip(self.keys, app.config['DATABASE_REPLICA_URLS'])}
+
+        # Replicas are Flask-SQLAlchemy binds, so their engines share the primary's pool configuration
+        binds = {key: url for key, url in (app.config.get('SQLALCHEMY_BINDS') or {}).items()
+                 if not key.startswith('replica-')}
+        binds.update(zip(self.keys, app.config['DATABASE_REPLICA_URLS']))
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        app.extensions['replicas'] = self
+        if self.stick_to_primary not in app.after_request_funcs.setdefault(None, []):
+            app.after_request(self.stick_to_primary)
+
+    def choose(self):
+        """Return the engine of a replica within the lag limit, or None if the request should read the primary."""
+        if not self.keys or request.cookies.get(STICKY_COOKIE):
+            return None
+
+        candidates = [key for key in self.keys if self._within_lag(key)]
+        if not candidates:
+            return None
+        return self.db.get_engine(bind=random.choice(candidates))
+
+    def stick_to_primary(self, response):
+        """Send the client's reads to the primary for a while after a successful write."""
+        if self.keys and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True)
+        return response
+
+    def _within_lag(self, key):
+        now = time.monotonic()
+        with self._lock:
+            lag, checked_at = self._lag.get(key, (None, None))
+            check = (checked_at is None or now - checked_at >= self.check_interval) and key not in self._checking
+            if check:
+                self._checking.add(key)
+
+        # One request at a time checks a replica, while the others use its last lag, or the primary until it is known
+        if check:
+            try:
+                lag = self._check_lag(key)
+                with self._lock:
+                    self._lag[key] = (lag, now)
+            finally:
+                with self._lock:
+                    self._checking.discard(key)
+
+        return lag is not None and lag <= self.max_lag
+
+    def _check_lag(self, key):
+        try:
+            with self._probes[key].connect() as connection, connection.begin():
+                connection.execute('SET LOCAL statement_timeout = {0:d}'.format(self.check_timeout * 1000))
+                return float(connection.execute(LAG_QUERY).scalar())
+        except SQLAlchemyError:
+            return None
+
+
+def read_only(view):
+    """Mark a view as only reading, so its queries can be served by a replica."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        g.read_replica = current_app.extensions['replicas'].choose()
+        return view(*args, **kwargs)
+
+    return decorated
+
+
+def read_replica():
+    """Return the replica engine chosen for the current request, if any."""
+    return g.get('read_replica') if has_app_context() else None
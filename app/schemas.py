@@ -0,0 +1,88 @@
+import json
+import uuid
+from datetime import date, datetime
+from functools import lru_cache
+
+from jsonschema import Draft7Validator, FormatChecker
+from jsonschema.exceptions import best_match
+from werkzeug.exceptions import BadRequest
+
+# JSON schemas for requests and responses, parsed once for the whole API
+with open('openapi.json') as json_file:
+    openapi = json.load(json_file)
+schemas = openapi["components"]["schemas"]
+
+format_checker = FormatChecker()
+
+
+def to_datetime(value):
+    """Parse an RFC 3339 date-time, which fromisoformat accepts apart from the 'Z' UTC designator."""
+    if value[-1:] in ('Z', 'z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+# Format checks on the standard library's C parsers, so malformed values are rejected before reaching the database
+@format_checker.checks('date-time', raises=ValueError)
+def is_datetime(instance):
+    return not isinstance(instance, str) or to_datetime(instance) is not None
+
+
+@format_checker.checks('date', raises=ValueError)
+def is_date(instance):
+    return not isinstance(instance, str) or date.fromisoformat(instance) is not None
+
+
+@format_checker.checks('uuid', raises=ValueError)
+def is_uuid(instance):
+    return not isinstance(instance, str) or uuid.UUID(instance) is not None
+
+
+@lru_cache(maxsize=None)
+def validator(name, partial=False):
+    """Return the validator for a named schema, checking and compiling it on first use only.
+
+    A partial validator checks only the properties that are present, as none are required, and rejects any other.
+    """
+    schema = _json_schema(schemas[name])
+    if partial:
+        schema.pop('required', None)
+        schema['additionalProperties'] = False
+    Draft7Validator.check_schema(schema)
+    return Draft7Validator(schema, format_checker=format_checker)
+
+
+def _json_schema(schema):
+    """Translate an OpenAPI schema object into JSON Schema, which spells 'nullable' as a 'null' type."""
+    if isinstance(schema, list):
+        return [_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+
+    result = {key: _json_schema(value) for key, value in schema.items() if key != 'nullable'}
+    if schema.get('nullable') and 'type' in result:
+        result['type'] = [result['type'], 'null']
+        if 'enum' in result:
+            result['enum'] = result['enum'] + [None]
+    return result
+
+
+def validate(instance, name):
+    """Validate a request body against a named schema, raising BadRequest with the most relevant error."""
+    error = best_match(validator(name).iter_errors(instance))
+    if error is not None:
+        raise BadRequest(error.message)
+
+
+def validate_patch(instance, name):
+    """Validate a JSON Merge Patch (RFC 7396) of a named request schema, whose fields are all optional.
+
+    A null field removes the value, so it is only valid for nullable properties. Fields the schema does not define,
+    such as an id or timestamps, are rejected rather than written.
+    """
+    if not isinstance(instance, dict):
+        raise BadRequest("Merge patch must be an object")
+
+    error = best_match(validator(name, partial=True).iter_errors(instance))
+    if error is not None:
+        raise BadRequest(error.message)
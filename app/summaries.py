@@ -0,0 +1,83 @@
+from sqlalchemy import BigInteger, and_, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app import archive, db
+from app.models import ChildDailySummary, Event
+
+summary_table = ChildDailySummary.__table__
+event_table = Event.__table__
+
+# Event fields the counters of a daily summary depend on, so changing any other leaves the summaries as they are
+SUMMARY_FIELDS = frozenset(['type', 'change_type', 'started_at', 'ended_at', 'amount', 'unit'])
+
+
+def _day(events):
+    """The day of each Event in a table or selectable of Events. Summary days are calendar days in UTC."""
+    return func.date(func.timezone('UTC', events.c.started_at))
+
+
+def _aggregates(events=event_table):
+    """Named column expressions aggregating Events into the counters of a daily summary."""
+    event = events.c
+    sleep_seconds = cast(func.floor(func.extract('epoch', event.ended_at - event.started_at)), BigInteger)
+
+    return [
+        ('event_count', func.count()),
+        ('sleep_count', func.count().filter(event.type == 'sleep')),
+        ('sleep_seconds', func.coalesce(func.sum(sleep_seconds).filter(event.type == 'sleep'), 0)),
+        ('feed_count', func.count().filter(event.type == 'feed')),
+        ('feed_ml', func.coalesce(func.sum(event.amount).filter(and_(event.type == 'feed', event.unit == 'ml')), 0)),
+        ('feed_fl_oz', func.coalesce(func.sum(event.amount).filter(and_(event.type == 'feed',
+                                                                        event.unit == 'fl oz')), 0)),
+        ('change_count', func.count().filter(event.type == 'change')),
+        ('change_wet', func.count().filter(and_(event.type == 'change', event.change_type == 'wet'))),
+        ('change_soiled', func.count().filter(and_(event.type == 'change', event.change_type == 'soiled'))),
+        ('change_dry', func.count().filter(and_(event.type == 'change', event.change_type == 'dry'))),
+    ]
+
+
+def add_events(child_id, event_ids):
+    """Add the contribution of the given Events to their Child's daily summaries."""
+    _apply(child_id, event_ids, 1)
+
+
+def subtract_events(child_id, event_ids):
+    """Remove the contribution of the given Events from their Child's daily summaries.
+
+    Must be called while the Events still hold the values that were previously added.
+    """
+    _apply(child_id, event_ids, -1)
+    ChildDailySummary.query.filter(ChildDailySummary.child_id == child_id, ChildDailySummary.event_count <= 0) \
+                           .delete(synchronize_session=False)
+
+
+def rebuild(child_ids=None):
+    """Recompute daily summaries from scratch, including archived Events, for all Children or only those given."""
+    summaries = ChildDailySummary.query
+    if child_ids is not None:
+        summaries = summaries.filter(ChildDailySummary.child_id.in_(child_ids))
+    source = archive.all_events(child_ids)
+    events = select([source.c.child_id, _day(source)] + [value for name, value in _aggregates(source)]) \
+        .group_by(source.c.child_id, _day(source))
+
+    summaries.delete(synchronize_session=False)
+    columns = ['child_id', 'day'] + [name for name, value in _aggregates()]
+    db.session.execute(summary_table.insert().from_select(columns, events))
+
+
+def _apply(child_id, event_ids, sign):
+    """Upsert signed per-day deltas for the given Events, computed in the database from their current rows."""
+    if not event_ids:
+        return
+
+    aggregates = _aggregates()
+    deltas = select([event_table.c.child_id, _day(event_table)] + [value * sign for name, value in aggregates]) \
+        .where(and_(event_table.c.child_id == child_id, event_table.c.id.in_(event_ids))) \
+        .group_by(event_table.c.child_id, _day(event_table))
+
+    statement = insert(summary_table).from_select(['child_id', 'day'] + [name for name, value in aggregates], deltas)
+    statement = statement.on_conflict_do_update(
+        index_elements=[summary_table.c.child_id, summary_table.c.day],
+        set_={name: summary_table.c[name] + statement.excluded[name] for name, value in aggregates}
+    )
+    db.session.execute(statement)
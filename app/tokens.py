@@ -0,0 +1,132 @@
+import calendar
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.exceptions import Forbidden, Unauthorized
+
+
+class Denylist(object):
+    """An in-process set of revoked token IDs, each kept only until its token would have expired anyway."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, token_id, expires_at):
+        with self._lock:
+            self._entries[token_id] = expires_at
+            if len(self._entries) > self.max_entries:
+                now = time.time()
+                for key in [key for key, value in self._entries.items() if value < now]:
+                    del self._entries[key]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def __contains__(self, token_id):
+        with self._lock:
+            return token_id in self._entries
+
+
+class Tokens(object):
+    """Issues and verifies signed access and refresh tokens, so requests are authenticated without a password check.
+
+    Access tokens are verified from their signature alone, without touching the database, so revoking one only takes
+    effect in the process that revoked it until it expires. Refresh tokens are checked against the database when used.
+    """
+
+    def __init__(self, app=None):
+        self.access_ttl = 900
+        self.refresh_ttl = 2592000
+        self.denylist = Denylist()
+        self._access = None
+        self._refresh = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.access_ttl = app.config['ACCESS_TOKEN_TTL']
+        self.refresh_ttl = app.config['REFRESH_TOKEN_TTL']
+        self.denylist = Denylist(max_entries=app.config['TOKEN_DENYLIST_MAX_ENTRIES'])
+        self._access = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='access-token')
+        self._refresh = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='refresh-token')
+        app.extensions['tokens'] = self
+
+    def issue(self, user):
+        """Issue a new access and refresh token pair for a User."""
+        access_token = self._access.dumps({'sub': str(user.id), 'jti': uuid.uuid4().hex})
+        refresh_token = self._refresh.dumps({'sub': str(user.id), 'jti': uuid.uuid4().hex,
+                                             'pwd': password_fingerprint(user)})
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "token_type": "Bearer",
+            "expires_in": self.access_ttl
+        }
+
+    def verify_access(self, token):
+        """Return the claims of a valid access token, or raise Unauthorized."""
+        return self._verify(self._access, token, self.access_ttl)
+
+    def verify_refresh(self, token):
+        """Return the claims of a refresh token with a valid signature, or raise Unauthorized."""
+        return self._verify(self._refresh, token, self.refresh_ttl)
+
+    def revoke(self, claims):
+        """Reject a token in this process from now until it expires."""
+        self.denylist.add(claims['jti'], claims['exp'])
+
+    def _verify(self, serializer, token, ttl):
+        try:
+            claims, issued_at = serializer.loads(token, max_age=ttl, return_timestamp=True)
+        except SignatureExpired:
+            raise Unauthorized('Token has expired')
+        except BadSignature:
+            raise Unauthorized('Token is invalid')
+
+        if claims['jti'] in self.denylist:
+            raise Unauthorized('Token has been revoked')
+        claims['exp'] = calendar.timegm(issued_at.utctimetuple()) + ttl
+        return claims
+
+
+def password_fingerprint(user):
+    """A short digest of a User's password hash, so changing the password invalidates their refresh tokens."""
+    return hashlib.sha256(bytes(user.password)).hexdigest()[:16]
+
+
+def authenticated(view):
+    """Require a valid access token in the Authorization header, making its claims available as g.token."""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            raise Unauthorized("An 'Authorization: Bearer' access token is required")
+
+        g.token = current_app.extensions['tokens'].verify_access(token)
+        return view(*args, **kwargs)
+
+    return decorated
+
+
+def admin_required(view):
+    """Require a valid access token for one of the users in ADMIN_USER_IDS."""
+    @wraps(view)
+    @authenticated
+    def decorated(*args, **kwargs):
+        if g.token['sub'] not in current_app.config['ADMIN_USER_IDS']:
+            raise Forbidden('Only administrators can use this endpoint')
+        return view(*args, **kwargs)
+
+    return decorated
+
+
+def current_user_id():
+    """Return the ID of the User whose access token authenticated the current request."""
+    return g.token['sub'] if 'token' in g else None
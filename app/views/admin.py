@@ -0,0 +1,59 @@
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from flask import Blueprint, Response, current_app, request
+from flask_negotiate import consumes, produces
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import BadRequest, Conflict
+from werkzeug.wsgi import wrap_file
+
+from app import cache, db, encoder
+from app.accounts import export_accounts, import_accounts
+from app.tokens import admin_required
+
+admin = Blueprint('admin', __name__)
+
+
+@admin.route("/export", methods=['GET'])
+@produces('application/sql')
+@admin_required
+def export_data():
+    """Export Users, Children, guardianships and Events as PostgreSQL COPY blocks."""
+    try:
+        user_ids = [str(uuid.UUID(user_id)) for user_id in request.args.getlist('user_id')]
+    except ValueError:
+        raise BadRequest("'user_id' must be a UUID")
+
+    # Spool the export to memory or disk first, so the database connection is not held while a slow client downloads
+    file = SpooledTemporaryFile(max_size=current_app.config['ACCOUNT_EXPORT_MEMORY_LIMIT'])
+    export_accounts(file, user_ids or None)
+    db.session.commit()
+    file.seek(0)
+
+    return Response(response=wrap_file(request.environ, file),
+                    mimetype='application/sql',
+                    status=200,
+                    direct_passthrough=True)
+
+
+@admin.route("/import", methods=['POST'])
+@consumes('application/sql')
+@produces('application/json')
+@admin_required
+def import_data():
+    """Import Users, Children, guardianships and Events from an export, keeping their IDs."""
+    try:
+        counts, namespaces = import_accounts(request.stream)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        raise BadRequest(str(e))
+    except IntegrityError:
+        db.session.rollback()
+        raise Conflict("The import contains rows that already exist.")
+
+    cache.invalidate(*namespaces)
+
+    return Response(response=encoder.dumps(counts),
+                    mimetype='application/json',
+                    status=200)
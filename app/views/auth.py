@@ -1,34 +1,27 @@
-import json
-from datetime import datetime
+from datetime import datetime, timezone
 
-from flask import Blueprint, Response, request
+from flask import Blueprint, Response, g, request
 from flask_negotiate import consumes, produces
-from jsonschema import FormatChecker, ValidationError, validate
-from werkzeug.exceptions import BadRequest, Unauthorized
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import Unauthorized
 
-from app import db
-from app.models import User
+from app import cache, db, encoder, tokens
+from app.models import RevokedToken, User
+from app.schemas import validate
+from app.tokens import authenticated, current_user_id, password_fingerprint
 
 auth = Blueprint('auth', __name__)
 
-# JSON schema for user requests
-with open('openapi.json') as json_file:
-    openapi = json.load(json_file)
-login_schema = openapi["components"]["schemas"]["LoginRequest"]
-
 
 @auth.route("/login", methods=['POST'])
 @consumes("application/json")
 @produces('application/json')
 def login_user():
-    """Authenticate User by email address and password."""
+    """Authenticate User by email address and password, issuing access and refresh tokens."""
     login_request = request.json
 
     # Validate request against schema
-    try:
-        validate(login_request, login_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(login_request, "LoginRequest")
 
     # Check user is registered
     user = User.query.filter_by(email_address=login_request["email_address"].lower()).first()
@@ -38,9 +31,91 @@ def login_user():
     # Check user credentials
     if user.check_password(login_request["password"]):
         user.login_at = datetime.utcnow()
+
+        # Upgrade the hash if the configured work factor has changed since it was made
+        if user.password_needs_rehash():
+            user.set_password(login_request["password"])
+
         db.session.add(user)
         db.session.commit()
+        cache.invalidate('user:{0}'.format(user.id))
 
-        return Response(response=repr(user), mimetype='application/json', status=200)
+        # Tokens are issued after any rehash, as refresh tokens are tied to the password hash
+        result = user.as_dict()
+        result.update(tokens.issue(user))
+        return Response(response=encoder.dumps(result), mimetype='application/json', status=200)
     else:
         raise Unauthorized()
+
+
+@auth.route("/refresh", methods=['POST'])
+@consumes("application/json")
+@produces('application/json')
+def refresh_tokens():
+    """Exchange a refresh token for a new access and refresh token pair."""
+    refresh_request = request.json
+
+    # Validate request against schema
+    validate(refresh_request, "RefreshRequest")
+    claims = tokens.verify_refresh(refresh_request["refresh_token"])
+
+    # Refresh tokens stop working when the user is deleted or changes their password
+    user = User.query.get(claims['sub'])
+    if user is None or password_fingerprint(user) != claims['pwd']:
+        raise Unauthorized('Token has been revoked')
+
+    # Each refresh token can only be used once, which the revoked token's primary key enforces in every process
+    try:
+        _revoke_refresh_token(claims)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise Unauthorized('Token has been revoked')
+
+    return Response(response=encoder.dumps(tokens.issue(user)),
+                    mimetype='application/json',
+                    status=200)
+
+
+@auth.route("/logout", methods=['POST'])
+@produces('application/json')
+@authenticated
+def logout_user():
+    """Revoke the access token used for the request and, if given, a refresh token."""
+    tokens.revoke(g.token)
+
+    refresh_request = request.get_json(silent=True)
+    if refresh_request is not None:
+        validate(refresh_request, "RefreshRequest")
+        claims = tokens.verify_refresh(refresh_request["refresh_token"])
+        if claims['sub'] == current_user_id():
+            try:
+                _revoke_refresh_token(claims)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+    return Response(response=None,
+                    mimetype='application/json',
+                    status=204)
+
+
+@auth.route("/token", methods=['GET'])
+@produces('application/json')
+@authenticated
+def get_token():
+    """Get the User ID and expiry of a valid access token, checking only its signature."""
+    result = {
+        "user_id": g.token['sub'],
+        "expires_at": datetime.fromtimestamp(g.token['exp'], timezone.utc).isoformat()
+    }
+
+    return Response(response=encoder.dumps(result),
+                    mimetype='application/json',
+                    status=200)
+
+
+def _revoke_refresh_token(claims):
+    """Revoke a refresh token in this process now, and in every process once the transaction commits."""
+    tokens.revoke(claims)
+    db.session.add(RevokedToken(claims['jti'], datetime.fromtimestamp(claims['exp'], timezone.utc)))
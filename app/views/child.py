@@ -1,38 +1,57 @@
 import json
-from datetime import date, datetime
+import time
+import uuid
+from contextlib import closing
+from datetime import date, datetime, timezone
 
-from flask import Blueprint, Response, request, url_for
+from flask import Blueprint, Response, current_app, request, stream_with_context, url_for
 from flask_negotiate import consumes, produces
-from jsonschema import FormatChecker, ValidationError, validate
-from werkzeug.exceptions import BadRequest
-
-from app import db
-from app.models import Child, Event, User
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased, load_only, noload
+from werkzeug.exceptions import BadRequest, Gone, NotFound
+
+from app import analytics, archive, cache, changes, db, encoder, notifier, summaries
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from app.idempotency import idempotent
+from app.models import Child, ChildDailySummary, Event, User, isoformat, user_child, user_ids_by_child
+from app.pagination import (decode_change_cursor, decode_cursor, encode_change_cursor, encode_cursor, parse_date,
+                            parse_datetime, parse_limit)
+from app.replicas import read_only
+from app.schemas import schemas, to_datetime, validate, validate_patch
 
 child = Blueprint('child', __name__)
 
-# JSON schema for child requests
-with open('openapi.json') as json_file:
-    openapi = json.load(json_file)
-child_schema = openapi["components"]["schemas"]["ChildRequest"]
-event_schema = openapi["components"]["schemas"]["EventRequest"]
+# Optional event fields copied verbatim from requests
+event_fields = ["feed_type", "change_type", "amount", "unit", "side", "notes"]
 
 
 @child.route("", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_children():
     """Get Children for a given User ID"""
     user_query = request.args.get('user_id', type=str)
     result = []
 
-    if user_query is not None:
-        user = User.query.get_or_404(user_query)
-        for child in user.children:
-            result.append(child.as_dict())
-    else:
+    if user_query is None:
         raise BadRequest("'user_id' is a required query parameter")
 
-    return Response(response=json.dumps(result, sort_keys=True, separators=(',', ':')),
+    entry = cache.entry('user:{0}'.format(user_query), 'children')
+    body = entry.get()
+    if body is None:
+        if db.session.query(User.id).filter(User.id == user_query).first() is None:
+            raise NotFound()
+
+        # Load the children and their users' IDs in two queries, however many children there are
+        children = Child.query.join(user_child).filter(user_child.c.user_id == user_query).all()
+        user_ids = user_ids_by_child(child.id for child in children)
+        for child in children:
+            result.append(child.as_dict(user_ids=user_ids[child.id]))
+        body = encoder.dumps(result)
+        entry.set(body)
+
+    return Response(response=body,
                     mimetype='application/json',
                     status=200)
 
@@ -40,15 +59,13 @@ def get_children():
 @child.route("", methods=['POST'])
 @consumes("application/json")
 @produces('application/json')
+@idempotent
 def create_child():
     """Create a new Child."""
     child_request = request.json
 
     # Validate request against schema
-    try:
-        validate(child_request, child_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(child_request, "ChildRequest")
 
     if date.fromisoformat(child_request["date_of_birth"]) > date.today():
         raise BadRequest('Date of birth must be in the past')
@@ -61,18 +78,14 @@ def create_child():
     )
 
     # Add user to child
-    users = []
-    for user_id in child_request["users"]:
-        user = User.query.get(str(user_id))
-        if user:
-            users.append(user)
-        else:
-            raise BadRequest("'{0}' is not a valid user ID".format(user_id))
+    users = _users(child_request["users"])
     child.users = users
+    namespaces = ['user:{0}'.format(user.id) for user in users]
 
     # Commit child to db
     db.session.add(child)
     db.session.commit()
+    cache.invalidate(*namespaces)
 
     # Create response
     response = Response(response=repr(child), mimetype='application/json', status=201)
@@ -83,13 +96,20 @@ def create_child():
 
 @child.route("/<uuid:child_id>", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_child(child_id):
     """Get a Child for a given ID."""
-    child = Child.query.get_or_404(str(child_id))
+    entry = cache.entry('child:{0}'.format(child_id), 'child')
+    body = entry.get()
+    if body is None:
+        body = repr(Child.query.get_or_404(str(child_id)))
+        entry.set(body)
 
-    return Response(response=repr(child),
-                    mimetype='application/json',
-                    status=200)
+    etag = make_etag(body)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    return set_validators(Response(response=body, mimetype='application/json', status=200), etag)
 
 
 @child.route("/<uuid:child_id>", methods=['PUT'])
@@ -100,47 +120,110 @@ def update_child(child_id):
     child_request = request.json
 
     # Validate request against schema
-    try:
-        validate(child_request, child_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(child_request, "ChildRequest")
 
     # Retrieve existing child
     child = Child.query.get_or_404(str(child_id))
+    namespaces = ['child:{0}'.format(child.id)] + ['user:{0}'.format(user.id) for user in child.users]
 
     # Update child
-    child.first_name = child_request["first_name"].title(),
-    child.last_name = child_request["last_name"].title(),
-    child.date_of_birth = child_request["date_of_birth"],
+    child.first_name = child_request["first_name"].title()
+    child.last_name = child_request["last_name"].title()
+    child.date_of_birth = child_request["date_of_birth"]
     child.updated_at = datetime.utcnow()
 
     # Add user to child
-    users = []
-    for user_id in child_request["users"]:
-        user = User.query.get(str(user_id))
-        if user:
-            users.append(user)
-        else:
-            raise BadRequest("'{0}' is not a valid user ID".format(user_id))
+    users = _users(child_request["users"])
     child.users = users
+    namespaces += ['user:{0}'.format(user.id) for user in users]
 
     # Commit child to db
     db.session.add(child)
     db.session.commit()
+    cache.invalidate(*namespaces)
 
     return Response(response=repr(child),
                     mimetype='application/json',
                     status=200)
 
 
+@child.route("/<uuid:child_id>", methods=['PATCH'])
+@consumes("application/merge-patch+json")
+@produces('application/json')
+def patch_child(child_id):
+    """Update only the given fields of a Child, from a JSON Merge Patch."""
+    patch = request.json
+
+    # Validate only the fields in the patch
+    validate_patch(patch, "ChildRequest")
+
+    child = Child.query.get_or_404(str(child_id))
+    user_ids = db.session.query(user_child.c.user_id).filter(user_child.c.child_id == child.id)
+    user_ids = set(user_id for (user_id,) in user_ids)
+
+    # Find the fields that change, so the UPDATE sets only those columns
+    values = {}
+    if "first_name" in patch:
+        values["first_name"] = patch["first_name"].title()
+    if "last_name" in patch:
+        values["last_name"] = patch["last_name"].title()
+    if "date_of_birth" in patch:
+        values["date_of_birth"] = date.fromisoformat(patch["date_of_birth"])
+        if values["date_of_birth"] > date.today():
+            raise BadRequest('Date of birth must be in the past')
+    values = dict((name, value) for name, value in values.items() if getattr(child, name) != value)
+
+    # Write only the guardianships that are added or removed
+    added = removed = set()
+    if "users" in patch:
+        requested = set(user.id for user in _users(patch["users"]))
+        added, removed = requested - user_ids, user_ids - requested
+
+    if values or added or removed:
+        for name, value in values.items():
+            setattr(child, name, value)
+        child.updated_at = datetime.utcnow()
+        if removed:
+            db.session.execute(user_child.delete().where(and_(user_child.c.child_id == child.id,
+                                                              user_child.c.user_id.in_(removed))))
+        if added:
+            db.session.execute(insert(user_child).values([{"user_id": user_id, "child_id": child.id}
+                                                          for user_id in added]).on_conflict_do_nothing())
+        db.session.commit()
+        cache.invalidate('child:{0}'.format(child.id), *['user:{0}'.format(user_id) for user_id in user_ids | added])
+
+    return Response(response=repr(child),
+                    mimetype='application/json',
+                    status=200)
+
+
+def _users(user_ids):
+    """Load the Users with the given IDs in a single query, without their children."""
+    try:
+        user_ids = [str(uuid.UUID(str(user_id))) for user_id in user_ids]
+    except ValueError as e:
+        raise BadRequest(str(e))
+
+    users = User.query.options(load_only(User.id), noload(User.children)).filter(User.id.in_(user_ids)).all()
+    found = set(user.id for user in users)
+    for user_id in user_ids:
+        if user_id not in found:
+            raise BadRequest("'{0}' is not a valid user ID".format(user_id))
+
+    return users
+
+
 @child.route("/<uuid:child_id>", methods=['DELETE'])
 @produces('application/json')
 def delete_child(child_id):
     """Delete a Child for a given ID."""
     child = Child.query.get_or_404(str(child_id))
+    namespaces = ['child:{0}'.format(child.id), 'events:{0}'.format(child.id)] + \
+        ['user:{0}'.format(user.id) for user in child.users]
 
     db.session.delete(child)
     db.session.commit()
+    cache.invalidate(*namespaces)
     return Response(response=None,
                     mimetype='application/json',
                     status=204)
@@ -148,40 +231,252 @@ def delete_child(child_id):
 
 @child.route("/<uuid:child_id>/events", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_events(child_id):
-    """Get Events for a Child."""
-    events = Event.query.filter_by(child_id=str(child_id)).order_by(Event.started_at.desc()).all()
+    """Get a page of Events for a Child, most recent first."""
+    limit = parse_limit(request.args, current_app.config['EVENTS_PER_PAGE'], current_app.config['EVENTS_MAX_PER_PAGE'])
+    since = parse_datetime(request.args, 'since')
+    until = parse_datetime(request.args, 'until')
+    type_query = request.args.get('type', type=str)
+    cursor_query = request.args.get('cursor', type=str)
+    if type_query is not None and type_query not in schemas["EventRequest"]["properties"]["type"]["enum"]:
+        raise BadRequest("'{0}' is not a valid event type".format(type_query))
+
+    entry = cache.entry('events:{0}'.format(child_id), request.query_string.decode('UTF-8'))
+    page = entry.get()
+    if page is not None:
+        page = json.loads(page)
+        if is_not_modified(page["etag"]):
+            return not_modified(page["etag"])
+        response = Response(response=page["body"], mimetype='application/json', status=200)
+        if page["next"] is not None:
+            response.headers["X-Next"] = page["next"]
+        return set_validators(response, page["etag"])
+
+    # Filter to the requested time window and event type
+    query = Event.query.filter(*_event_criteria(Event, child_id, since, until, type_query))
+
+    # Answer conditional requests from the count and latest change of matching events, without loading any. There is
+    # no Last-Modified, as deleting an event other than the latest leaves the latest change where it was
+    count, latest = query.with_entities(func.count(Event.id),
+                                        func.max(func.coalesce(Event.updated_at, Event.created_at))).one()
+
+    # Archived events only count when the window reaches back into the archive, through its segments' versions
+    extent = archive.extent(child_id)
+    if extent is not None and (since is None or _utc(since) < extent.end):
+        count = (count, extent.event_count, extent.archived_at.isoformat())
+    else:
+        extent = None
+
+    etag = make_etag(child_id, request.query_string.decode('UTF-8'), count, latest.isoformat() if latest else latest)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    # Seek past the last event of the previous page
+    cursor = decode_cursor(cursor_query) if cursor_query is not None else None
+
+    # Fetch one extra event to find out whether there is a next page
+    events = _event_page(Event, query, cursor, limit)
+
+    # Read archived events as well only when the page runs out of current ones or reaches past the hot window
+    if extent is not None and (len(events) <= limit or events[-1].started_at < extent.end):
+        source = aliased(Event, archive.all_events([str(child_id)], since, until))
+        query = db.session.query(source).filter(*_event_criteria(source, child_id, since, until, type_query))
+        events = _event_page(source, query, cursor, limit)
+
     result = []
-    for event in events:
+    for event in events[:limit]:
         result.append(event.as_dict())
 
-    return Response(response=json.dumps(result, sort_keys=True, separators=(',', ':')),
-                    mimetype='application/json',
+    body = encoder.dumps(result)
+    response = Response(response=body, mimetype='application/json', status=200)
+
+    next_url = None
+    if len(events) > limit:
+        args = request.args.to_dict()
+        args.pop("child_id", None)
+        args["cursor"] = encode_cursor(events[limit - 1].started_at, events[limit - 1].id)
+        next_url = url_for('child.get_events', child_id=child_id, **args)
+        response.headers["X-Next"] = next_url
+
+    entry.set(json.dumps({
+        "body": body,
+        "next": next_url,
+        "etag": etag
+    }))
+
+    return set_validators(response, etag)
+
+
+def _event_criteria(source, child_id, since, until, type_query):
+    """Criteria for a Child's Events in a time window and of a type, on Event or an alias of it."""
+    criteria = [source.child_id == str(child_id)]
+    if since is not None:
+        criteria.append(source.started_at >= since)
+    if until is not None:
+        criteria.append(source.started_at < until)
+    if type_query is not None:
+        criteria.append(source.type == type_query)
+    return criteria
+
+
+def _event_page(source, query, cursor, limit):
+    """Fetch a page of Events most recent first, after a cursor if given, with one extra to show there are more."""
+    if cursor is not None:
+        started_at, event_id = cursor
+        query = query.filter(or_(source.started_at < started_at,
+                                 and_(source.started_at == started_at, source.id > event_id)))
+    return query.order_by(source.started_at.desc(), source.id).limit(limit + 1).all()
+
+
+@child.route("/<uuid:child_id>/events/export", methods=['GET'])
+@produces('application/x-ndjson', 'application/json')
+@read_only
+def export_events(child_id):
+    """Stream every Event for a Child as NDJSON or a JSON array."""
+    Child.query.get_or_404(str(child_id))
+
+    # Read events through a server-side cursor so memory use is flat regardless of history size
+    batch_size = current_app.config['EVENTS_EXPORT_BATCH_SIZE']
+    source = Event
+    if archive.extent(child_id) is not None:
+        source = aliased(Event, archive.all_events([str(child_id)]))
+    events = db.session.query(source).filter(source.child_id == str(child_id)) \
+                                     .order_by(source.started_at.desc(), source.id) \
+                                     .yield_per(batch_size)
+
+    mimetype = request.accept_mimetypes.best_match(['application/x-ndjson', 'application/json'])
+    if mimetype == 'application/json':
+        chunks = _json_array_chunks(events, batch_size)
+    else:
+        chunks = _ndjson_chunks(events, batch_size)
+
+    return Response(response=stream_with_context(chunks),
+                    mimetype=mimetype,
                     status=200)
 
 
+def _serialized_batches(events, batch_size):
+    """Serialize Events to JSON strings, grouped into lists of at most batch_size."""
+    batch = []
+    for event in events:
+        batch.append(encoder.dumps(event.as_dict()))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ndjson_chunks(events, batch_size):
+    """Stream Events as newline delimited JSON, one chunk per batch."""
+    for batch in _serialized_batches(events, batch_size):
+        yield '\n'.join(batch) + '\n'
+
+
+def _json_array_chunks(events, batch_size):
+    """Stream Events as a single JSON array, one chunk per batch."""
+    separator = '['
+    for batch in _serialized_batches(events, batch_size):
+        yield separator + ','.join(batch)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+@child.route("/<uuid:child_id>/events/changes", methods=['GET'])
+@produces('application/json', 'text/event-stream')
+def get_event_changes(child_id):
+    """Get Events created, updated or deleted after a cursor, waiting for a change or streaming them if asked."""
+    # Always read from the primary, which is where the changes that wake waiting requests are made
+    limit = parse_limit(request.args, current_app.config['EVENTS_PER_PAGE'], current_app.config['EVENTS_MAX_PER_PAGE'])
+    wait = request.args.get('wait', default=0, type=int)
+    since = request.headers.get('Last-Event-ID') or request.args.get('since', type=str)
+    if not 0 <= wait <= current_app.config['CHANGE_FEED_MAX_WAIT']:
+        raise BadRequest("'wait' must be a number of seconds between 0 and {0}".format(
+            current_app.config['CHANGE_FEED_MAX_WAIT']))
+
+    if db.session.query(Child.id).filter(Child.id == str(child_id)).first() is None:
+        raise NotFound()
+
+    # Without a cursor start from now, as clients fetch existing events from the event list
+    if since is None:
+        position = changes.head()
+    else:
+        position, issued_at = decode_change_cursor(since)
+        if issued_at < datetime.utcnow() - current_app.config['CHANGE_FEED_RETENTION']:
+            raise Gone("'since' has expired, fetch the event list again and start from a new cursor")
+
+    if request.accept_mimetypes.best_match(['application/json', 'text/event-stream']) == 'text/event-stream':
+        batches = _change_batches(str(child_id), position, limit, current_app.config['CHANGE_FEED_STREAM_SECONDS'])
+        return Response(response=stream_with_context(_event_stream(batches)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+                        status=200)
+
+    with closing(_change_batches(str(child_id), position, limit, wait)) as batches:
+        for result, position in batches:
+            if result:
+                break
+
+    response = Response(response=encoder.dumps(result), mimetype='application/json', status=200)
+    response.headers["X-Next"] = url_for('child.get_event_changes', child_id=child_id,
+                                         since=encode_change_cursor(position))
+    return response
+
+
+def _change_batches(child_id, position, limit, seconds):
+    """Read a Child's changes, then wait for and read more until seconds have passed, yielding each batch read."""
+    if seconds <= 0:
+        yield changes.changes_since(child_id, position, limit)
+        return
+
+    deadline = time.monotonic() + seconds
+    interval = current_app.config['CHANGE_FEED_POLL_INTERVAL']
+    with notifier.subscribe(child_id) as waiter:
+        while True:
+            waiter.clear()
+            result, position = changes.changes_since(child_id, position, limit)
+            # Hand the connection back to the pool rather than holding it while waiting
+            db.session.close()
+            yield result, position
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if not result:
+                waiter.wait(min(remaining, interval))
+
+
+def _event_stream(batches):
+    """Format batches of changes as server-sent events, whose IDs are cursors to resume from."""
+    with closing(batches):
+        for result, position in batches:
+            cursor = encode_change_cursor(position)
+            if result:
+                yield 'id: {0}\nevent: changes\ndata: {1}\n\n'.format(cursor, encoder.dumps(result))
+            else:
+                # An event without data is not dispatched, but keeps the connection alive and moves the client on
+                yield 'id: {0}\n\n'.format(cursor)
+
+
 @child.route("/<uuid:child_id>/events", methods=['POST'])
 @consumes("application/json")
 @produces('application/json')
+@idempotent
 def create_event(child_id):
     """Create a new Event."""
-    event_request = request.json
-
-    # Validate request against schema
-    # try:
-    #     validate(event_request, event_schema, format_checker=FormatChecker())
-    # except ValidationError as e:
-    #     raise BadRequest(e.message)
+    # Validate request against schema and cross-field rules
+    event_request, started_at, ended_at = _validate_event(request.json, str(child_id))
 
     # Create a new event object
     event = Event(
         user_id=event_request["user_id"],
         child_id=str(child_id),
         type=event_request["type"],
-        started_at=event_request["started_at"]
+        started_at=started_at
     )
 
-    event.ended_at = event_request["ended_at"] if "ended_at" in event_request else None
+    event.ended_at = ended_at
     event.feed_type = event_request["feed_type"] if "feed_type" in event_request else None
     event.change_type = event_request["change_type"] if "change_type" in event_request else None
     event.amount = event_request["amount"] if "amount" in event_request else None
@@ -189,9 +484,13 @@ def create_event(child_id):
     event.side = event_request["side"] if "side" in event_request else None
     event.notes = event_request["notes"] if "notes" in event_request else None
 
-    # Commit event to db
+    # Commit event and daily summary to db
     db.session.add(event)
+    db.session.flush()
+    summaries.add_events(event.child_id, [event.id])
+    changes.record(event.child_id, [event.id], 'created')
     db.session.commit()
+    cache.invalidate('events:{0}'.format(event.child_id))
 
     # Create response
     response = Response(response=repr(event), mimetype='application/json', status=201)
@@ -200,15 +499,172 @@ def create_event(child_id):
     return response
 
 
+@child.route("/<uuid:child_id>/events:batch", methods=['POST'])
+@consumes("application/json")
+@produces('application/json')
+@idempotent
+def create_events(child_id):
+    """Create many new Events for a Child in a single transaction."""
+    events_request = request.json
+    max_per_batch = current_app.config['EVENTS_MAX_PER_BATCH']
+
+    if not isinstance(events_request, list) or not 0 < len(events_request) <= max_per_batch:
+        raise BadRequest("Request must be an array of between 1 and {0} events".format(max_per_batch))
+
+    if db.session.query(Child.id).filter(Child.id == str(child_id)).first() is None:
+        raise NotFound()
+
+    # Validate every event, keeping per-item results in request order
+    results = []
+    rows = {}
+    for index, event_request in enumerate(events_request):
+        try:
+            rows[index] = _event_row(event_request, str(child_id))
+            results.append(None)
+        except BadRequest as e:
+            results.append({"status": 400, "description": e.description})
+
+    # Check all referenced users exist with a single query
+    user_ids = set(row["user_id"] for row in rows.values())
+    known_user_ids = set()
+    if user_ids:
+        known_user_ids = set(str(user_id) for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids)))
+
+    valid_rows = []
+    for index, row in rows.items():
+        if row["user_id"] in known_user_ids:
+            valid_rows.append(row)
+            results[index] = {
+                "status": 201,
+                "id": row["id"],
+                "location": url_for('child.get_event', child_id=child_id, event_id=row["id"])
+            }
+        else:
+            results[index] = {"status": 400, "description": "'{0}' is not a valid user ID".format(row["user_id"])}
+
+    # Insert all valid events with one multi-row INSERT
+    if valid_rows:
+        db.session.execute(Event.__table__.insert().values(valid_rows))
+        summaries.add_events(str(child_id), [row["id"] for row in valid_rows])
+        changes.record(str(child_id), [row["id"] for row in valid_rows], 'created')
+        db.session.commit()
+        cache.invalidate('events:{0}'.format(child_id))
+
+    return Response(response=encoder.dumps(results),
+                    mimetype='application/json',
+                    status=207)
+
+
+def _validate_event(event_request, child_id):
+    """Validate an Event request for a Child, returning it with child_id filled in and its parsed times."""
+    if not isinstance(event_request, dict):
+        raise BadRequest("Event must be an object")
+
+    event_request = dict(event_request)
+    event_request.setdefault("child_id", child_id)
+    validate(event_request, "EventRequest")
+
+    # Compare as UUIDs, as the body may spell the same ID in upper case or without hyphens
+    if uuid.UUID(event_request["child_id"]) != uuid.UUID(child_id):
+        raise BadRequest("'child_id' does not match the child in the URL")
+    started_at, ended_at = _event_rules(event_request)
+    return event_request, started_at, ended_at
+
+
+def _event_rules(event_request):
+    """Check the rules the schema cannot express, returning the Event's parsed times."""
+    if event_request["type"] == "feed" and event_request.get("feed_type") is None:
+        raise BadRequest("'feed_type' is required for feed events")
+    if event_request["type"] == "change" and event_request.get("change_type") is None:
+        raise BadRequest("'change_type' is required for change events")
+
+    started_at = to_datetime(event_request["started_at"])
+    ended_at = event_request.get("ended_at")
+    ended_at = to_datetime(ended_at) if ended_at is not None else None
+    if ended_at is not None and _utc(ended_at) < _utc(started_at):
+        raise BadRequest("'ended_at' must not be before 'started_at'")
+
+    return started_at, ended_at
+
+
+def _utc(value):
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _event_row(event_request, child_id):
+    """Validate an Event request and convert it to a row for a bulk insert."""
+    event_request, started_at, ended_at = _validate_event(event_request, child_id)
+
+    row = {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.UUID(event_request["user_id"])),
+        "child_id": child_id,
+        "type": event_request["type"],
+        "started_at": started_at,
+        "ended_at": ended_at,
+        "created_at": datetime.utcnow()
+    }
+    for field in event_fields:
+        row[field] = event_request.get(field)
+    return row
+
+
+@child.route("/<uuid:child_id>/summary", methods=['GET'])
+@produces('application/json')
+@read_only
+def get_summary(child_id):
+    """Get daily Event totals for a Child, oldest first."""
+    since = parse_date(request.args, 'since')
+    until = parse_date(request.args, 'until')
+
+    query = ChildDailySummary.query.filter(ChildDailySummary.child_id == str(child_id))
+    if since is not None:
+        query = query.filter(ChildDailySummary.day >= since)
+    if until is not None:
+        query = query.filter(ChildDailySummary.day < until)
+
+    result = []
+    for summary in query.order_by(ChildDailySummary.day):
+        result.append(summary.as_dict())
+
+    return Response(response=encoder.dumps(result),
+                    mimetype='application/json',
+                    status=200)
+
+
+@child.route("/<uuid:child_id>/statistics", methods=['GET'])
+@produces('application/json')
+@read_only
+def get_statistics(child_id):
+    """Get feed, sleep and change statistics for a Child over a time window."""
+    since = parse_datetime(request.args, 'since')
+    until = parse_datetime(request.args, 'until')
+    window = request.args.get('window', default=7, type=int)
+    if not 0 < window <= 366:
+        raise BadRequest("'window' must be a number of days between 1 and 366")
+
+    events = analytics.load_event_arrays(str(child_id), since, until)
+    result = analytics.compute_statistics(events, now=time.time(), window=window)
+
+    return Response(response=encoder.dumps(result),
+                    mimetype='application/json',
+                    status=200)
+
+
 @child.route("/<uuid:child_id>/events/<uuid:event_id>", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_event(child_id, event_id):
     """Get an Event for a given ID."""
-    event = Event.query.get_or_404(str(event_id))
+    event = _find_event(child_id, event_id)
 
-    return Response(response=repr(event),
-                    mimetype='application/json',
-                    status=200)
+    last_modified = event.updated_at or event.created_at
+    etag = make_etag(event.id, isoformat(last_modified))
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    return set_validators(Response(response=repr(event), mimetype='application/json', status=200),
+                          etag, last_modified)
 
 
 @child.route("/<uuid:child_id>/events/<uuid:event_id>", methods=['PUT'])
@@ -216,22 +672,18 @@ def get_event(child_id, event_id):
 @produces('application/json')
 def update_event(child_id, event_id):
     """Update a Event for a given ID."""
-    event_request = request.json
-
-    # Validate request against schema
-    # try:
-    #     validate(event_request, event_schema, format_checker=FormatChecker())
-    # except ValidationError as e:
-    #     raise BadRequest(e.message)
+    # Validate request against schema and cross-field rules
+    event_request, started_at, ended_at = _validate_event(request.json, str(child_id))
 
-    # Retrieve existing event
-    event = Event.query.get_or_404(str(event_id))
+    # Retrieve existing event, restoring it if archived, and remove it from its daily summary
+    event = _current_event(child_id, event_id)
+    summaries.subtract_events(event.child_id, [event.id])
 
     # Update event
     event.user_id = event_request["user_id"]
     event.type = event_request["type"]
-    event.started_at = event_request["started_at"]
-    event.ended_at = event_request["ended_at"] if "ended_at" in event_request else None
+    event.started_at = started_at
+    event.ended_at = ended_at
     event.feed_type = event_request["feed_type"] if "feed_type" in event_request else None
     event.change_type = event_request["change_type"] if "change_type" in event_request else None
     event.amount = event_request["amount"] if "amount" in event_request else None
@@ -240,23 +692,126 @@ def update_event(child_id, event_id):
     event.notes = event_request["notes"] if "notes" in event_request else None
     event.updated_at = datetime.utcnow()
 
-    # Commit event to db
+    # Commit event and daily summary to db
     db.session.add(event)
+    db.session.flush()
+    summaries.add_events(event.child_id, [event.id])
+    changes.record(event.child_id, [event.id], 'updated')
     db.session.commit()
+    cache.invalidate('events:{0}'.format(event.child_id))
 
     return Response(response=repr(event),
                     mimetype='application/json',
                     status=200)
 
 
+@child.route("/<uuid:child_id>/events/<uuid:event_id>", methods=['PATCH'])
+@consumes("application/merge-patch+json")
+@produces('application/json')
+def patch_event(child_id, event_id):
+    """Update only the given fields of an Event, from a JSON Merge Patch."""
+    patch = request.json
+
+    # Validate only the fields in the patch, then the rules across fields on the Event as patched
+    validate_patch(patch, "EventRequest")
+    if uuid.UUID(patch.get("child_id", str(child_id))) != child_id:
+        raise BadRequest("'child_id' does not match the child in the URL")
+
+    # Work out the changes on the event as it is read, then again once it is locked and moved back out of the
+    # archive, so a concurrent change is not subtracted from its daily summary twice
+    event = _find_event(child_id, event_id)
+    if _patch_values(event, patch):
+        event = _current_event(child_id, event_id)
+        values = _patch_values(event, patch)
+
+        if values:
+            if "user_id" in values:
+                _users([values["user_id"]])
+
+            # Summaries are only touched if their counts change
+            summarized = not summaries.SUMMARY_FIELDS.isdisjoint(values)
+            if summarized:
+                summaries.subtract_events(event.child_id, [event.id])
+            for name, value in values.items():
+                setattr(event, name, value)
+            event.updated_at = datetime.utcnow()
+
+            db.session.flush()
+            if summarized:
+                summaries.add_events(event.child_id, [event.id])
+            changes.record(event.child_id, [event.id], 'updated')
+            db.session.commit()
+            cache.invalidate('events:{0}'.format(event.child_id))
+
+    return Response(response=repr(event),
+                    mimetype='application/json',
+                    status=200)
+
+
+def _patch_values(event, patch):
+    """Return the fields of a merge patch that change an Event, after checking the rules across its fields."""
+    current = event.as_dict()
+    patched = dict(((name, current[name]) for name in schemas["EventRequest"]["properties"]), **patch)
+    started_at, ended_at = _event_rules(patched)
+
+    # Find the fields that change, so the UPDATE sets only those columns
+    values = {}
+    for name, value in patch.items():
+        if name == "started_at":
+            value = started_at
+        elif name == "ended_at":
+            value = ended_at
+        elif name == "user_id":
+            value = str(uuid.UUID(value))
+        if name != "child_id" and not _same(getattr(event, name), value):
+            values[name] = value
+    return values
+
+
+def _same(current, value):
+    """Whether a patched value equals the stored one, comparing times without a zone as UTC."""
+    if isinstance(current, datetime) and isinstance(value, datetime):
+        return _utc(current) == _utc(value)
+    return current == value
+
+
 @child.route("/<uuid:child_id>/events/<uuid:event_id>", methods=['DELETE'])
 @produces('application/json')
 def delete_event(child_id, event_id):
     """Delete a Event for a given ID."""
-    event = Event.query.get_or_404(str(event_id))
+    event = _current_event(child_id, event_id)
 
+    namespace = 'events:{0}'.format(event.child_id)
+
+    summaries.subtract_events(event.child_id, [event.id])
+    changes.record(event.child_id, [event.id], 'deleted')
     db.session.delete(event)
     db.session.commit()
+    cache.invalidate(namespace)
     return Response(response=None,
                     mimetype='application/json',
                     status=204)
+
+
+def _find_event(child_id, event_id):
+    """Load an Event to read, from the archive if it has been archived."""
+    event = Event.query.get(str(event_id))
+    if event is None:
+        event = next(iter(archive.find_events(child_id, [event_id])), None)
+        if event is None:
+            raise NotFound()
+    return event
+
+
+def _current_event(child_id, event_id):
+    """Load and lock an Event to change, first moving it back out of the archive if it has been archived."""
+    # Changes subtract the Event from its daily summary as it is loaded, so it must not change until they commit
+    query = Event.query.filter(Event.id == str(event_id)).with_for_update().populate_existing()
+    event = query.first()
+    if event is None:
+        # Look again even if another request restored the Event first, as it is then in the event table
+        archive.restore(child_id, event_id)
+        event = query.first()
+    if event is None:
+        raise NotFound()
+    return event
@@ -0,0 +1,18 @@
+from flask import Blueprint, Response
+from flask_negotiate import produces
+
+from app.models import Job
+
+job = Blueprint('job', __name__)
+
+
+@job.route("/<uuid:job_id>", methods=['GET'])
+@produces('application/json')
+def get_job(job_id):
+    """Get the status of a background Job for a given ID."""
+    # Always read from the primary, as clients poll for changes straight after creating the job
+    job = Job.query.get_or_404(str(job_id))
+
+    return Response(response=repr(job),
+                    mimetype='application/json',
+                    status=200)
@@ -0,0 +1,14 @@
+from flask import Blueprint, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from app import instrumentation
+
+metrics = Blueprint('metrics', __name__)
+
+
+@metrics.route("/metrics", methods=['GET'])
+def get_metrics():
+    """Get request, SQL and connection pool metrics for this process in the Prometheus text format."""
+    return Response(response=generate_latest(instrumentation.registry),
+                    mimetype=CONTENT_TYPE_LATEST,
+                    status=200)
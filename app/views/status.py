@@ -0,0 +1,18 @@
+from flask import Blueprint, Response
+from flask_negotiate import produces
+
+from app import db, encoder, replicas
+
+status = Blueprint('status', __name__)
+
+
+@status.route("/pool", methods=['GET'])
+@produces('application/json')
+def get_pool():
+    """Get database connection pool gauges and event counts for this process."""
+    result = db.pool_metrics.as_dict(db.engine)
+    result["replicas"] = {key: db.pool_metrics.as_dict(db.get_engine(bind=key)) for key in replicas.keys}
+
+    return Response(response=encoder.dumps(result),
+                    mimetype='application/json',
+                    status=200)
@@ -1,28 +1,23 @@
-import json
 from datetime import datetime
 
 from flask import Blueprint, Response, request, url_for
 from flask_negotiate import consumes, produces
-from jsonschema import FormatChecker, ValidationError, validate
 from sqlalchemy.exc import IntegrityError
-from werkzeug.exceptions import BadRequest, Conflict, Unauthorized
+from werkzeug.exceptions import BadRequest, Conflict, NotFound, Unauthorized
 
-from app import db
-from app.models import User
+from app import cache, db, encoder, jobs
+from app.accounts import delete_user_account
+from app.conditional import is_not_modified, make_etag, not_modified, set_validators
+from app.models import Job, User
+from app.replicas import read_only
+from app.schemas import validate, validate_patch
 
 user = Blueprint('user', __name__)
 
-# JSON schema for user requests
-with open('openapi.json') as json_file:
-    openapi = json.load(json_file)
-user_schema = openapi["components"]["schemas"]["UserRequest"]
-profile_schema = openapi["components"]["schemas"]["ProfileRequest"]
-password_schema = openapi["components"]["schemas"]["PasswordRequest"]
-login_schema = openapi["components"]["schemas"]["LoginRequest"]
-
 
 @user.route("", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_users():
     """Get Users."""
     email_query = request.args.get('email_address', type=str)
@@ -33,7 +28,7 @@ def get_users():
     else:
         raise BadRequest("'email_address' is a required query parameter")
 
-    return Response(response=json.dumps(result, sort_keys=True, separators=(',', ':')),
+    return Response(response=encoder.dumps(result),
                     mimetype='application/json',
                     status=200)
 
@@ -46,10 +41,7 @@ def create_user():
     user_request = request.json
 
     # Validate request against schema
-    try:
-        validate(user_request, user_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(user_request, "UserRequest")
 
     # Create a new user object
     user = User(
@@ -76,13 +68,20 @@ def create_user():
 
 @user.route("/<uuid:id>", methods=['GET'])
 @produces('application/json')
+@read_only
 def get_user(id):
     """Get a User for a given id."""
-    user = User.query.get_or_404(str(id))
+    entry = cache.entry('user:{0}'.format(id), 'user')
+    body = entry.get()
+    if body is None:
+        body = repr(User.query.get_or_404(str(id)))
+        entry.set(body)
 
-    return Response(response=repr(user),
-                    mimetype='application/json',
-                    status=200)
+    etag = make_etag(body)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    return set_validators(Response(response=body, mimetype='application/json', status=200), etag)
 
 
 @user.route("/<uuid:id>/profile", methods=['PUT'])
@@ -93,17 +92,14 @@ def update_user_profile(id):
     profile_request = request.json
 
     # Validate request against schema
-    try:
-        validate(profile_request, profile_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(profile_request, "ProfileRequest")
 
     # Retrieve existing user
     user = User.query.get_or_404(str(id))
 
     # Update user
-    user.first_name = profile_request["first_name"].title(),
-    user.last_name = profile_request["last_name"].title(),
+    user.first_name = profile_request["first_name"].title()
+    user.last_name = profile_request["last_name"].title()
     user.email_address = profile_request["email_address"].lower()
     user.updated_at = datetime.utcnow()
 
@@ -114,6 +110,48 @@ def update_user_profile(id):
     except IntegrityError as e:
         db.session.rollback()
         raise Conflict("'email_address' is already registered.")
+    cache.invalidate('user:{0}'.format(user.id))
+
+    return Response(response=repr(user),
+                    mimetype='application/json',
+                    status=200)
+
+
+@user.route("/<uuid:id>/profile", methods=['PATCH'])
+@consumes("application/merge-patch+json")
+@produces('application/json')
+def patch_user_profile(id):
+    """Update only the given fields of a User profile, from a JSON Merge Patch."""
+    patch = request.json
+
+    # Validate only the fields in the patch
+    validate_patch(patch, "ProfileRequest")
+
+    # Retrieve existing user
+    user = User.query.get_or_404(str(id))
+
+    # Find the fields that change, so the UPDATE sets only those columns
+    values = {}
+    if "first_name" in patch:
+        values["first_name"] = patch["first_name"].title()
+    if "last_name" in patch:
+        values["last_name"] = patch["last_name"].title()
+    if "email_address" in patch:
+        values["email_address"] = patch["email_address"].lower()
+    values = dict((name, value) for name, value in values.items() if getattr(user, name) != value)
+
+    if values:
+        for name, value in values.items():
+            setattr(user, name, value)
+        user.updated_at = datetime.utcnow()
+
+        try:
+            # Commit user to db
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise Conflict("'email_address' is already registered.")
+        cache.invalidate('user:{0}'.format(user.id))
 
     return Response(response=repr(user),
                     mimetype='application/json',
@@ -128,10 +166,7 @@ def update_user_password(id):
     password_request = request.json
 
     # Validate request against schema
-    try:
-        validate(password_request, password_schema, format_checker=FormatChecker())
-    except ValidationError as e:
-        raise BadRequest(e.message)
+    validate(password_request, "PasswordRequest")
 
     if password_request["new_password"] == password_request["current_password"]:
         raise BadRequest("New password must be different to current password")
@@ -147,6 +182,7 @@ def update_user_password(id):
         # Commit user to db
         db.session.add(user)
         db.session.commit()
+        cache.invalidate('user:{0}'.format(user.id))
 
         return Response(response=repr(user),
                         mimetype='application/json',
@@ -158,18 +194,35 @@ def update_user_password(id):
 @user.route("/<uuid:id>", methods=['DELETE'])
 @produces('application/json')
 def delete_user(id):
-    """Delete a User for a given id."""
-    user = User.query.get_or_404(str(id))
+    """Delete a User for a given id, along with any children that have no other users and their events."""
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return _delete_user_async(id)
 
-    # If user has children that will have no users as a result of deleting this user, delete those children too.
-    # This also results in events for that child being deleted too, by way of the foreign key cascade.
-    if len(user.children) > 0:
-        for child in user.children:
-            if len(child.users) == 1:
-                db.session.delete(child)
-
-    db.session.delete(user)
+    namespaces = delete_user_account(id)
+    if namespaces is None:
+        raise NotFound()
     db.session.commit()
+    cache.invalidate(*namespaces)
     return Response(response=None,
                     mimetype='application/json',
                     status=204)
+
+
+def _delete_user_async(id):
+    """Queue a job to delete a User, returning 202 Accepted with the job's status."""
+    if db.session.query(User.id).filter(User.id == str(id)).first() is None:
+        raise NotFound()
+
+    # Repeated requests share the job already waiting to delete the user
+    job = Job.query.filter(Job.type == 'delete_user', Job.subject_id == str(id),
+                           Job.status.in_(['pending', 'running'])).first()
+    if job is None:
+        job = Job('delete_user', id)
+        db.session.add(job)
+        db.session.commit()
+        jobs.submit(job)
+
+    response = Response(response=repr(job), mimetype='application/json', status=202)
+    response.headers["Location"] = url_for('job.get_job', job_id=job.id)
+    response.headers["Preference-Applied"] = 'respond-async'
+    return response
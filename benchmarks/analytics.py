@@ -0,0 +1,33 @@
+"""Time app.analytics.compute_statistics over synthetic event arrays.
+
+Usage: python -m benchmarks.analytics [events] [repeats]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+from app.analytics import CHANGE, FEED, SLEEP, compute_statistics
+
+
+def synthetic_events(count, seed=0):
+    """Generate arrays shaped like load_event_arrays output, roughly 12 events a day ending now."""
+    random = np.random.RandomState(seed)
+    now = 1555000000.0
+    started_at = np.sort(now - random.uniform(0, count * 7200, count))
+    types = random.choice([SLEEP, FEED, CHANGE], size=count, p=[0.3, 0.45, 0.25]).astype(np.int8)
+    ended_at = np.where(types == CHANGE, np.nan, started_at + random.uniform(600, 14400, count))
+    amount_ml = np.where(types == FEED, random.uniform(30, 240, count), np.nan)
+
+    return now, {'started_at': started_at, 'ended_at': ended_at, 'amount_ml': amount_ml, 'type': types}
+
+
+def main(count=100000, repeats=20):
+    now, events = synthetic_events(count)
+    best = min(timeit.repeat(lambda: compute_statistics(events, now=now), number=1, repeat=repeats))
+    print('compute_statistics: {0} events, {1} days, best of {2}: {3:.2f} ms'.format(
+        count, len(compute_statistics(events, now=now)['rolling_averages']), repeats, best * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,179 @@
+"""Generate a synthetic database of households sharing children with years of events, and a request trace to
+replay against it with benchmarks.replay.
+
+Usage: python -m benchmarks.data trace [households] [years] [requests]
+
+Writes to the empty database at DATABASE_URL, which should be one kept for benchmarking.
+"""
+import json
+import random
+import sys
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from app import app, db, partitions, passwords, summaries
+from app.analytics import CHANGE, FEED, SLEEP
+from app.models import Child, Event, User, user_child
+from benchmarks.analytics import synthetic_events
+
+# Rows inserted per multi-row INSERT statement
+PAGE_SIZE = 1000
+
+# Event IDs kept per child for requests that fetch a single event
+SAMPLED_EVENTS = 20
+
+# Relative frequency of each kind of request in a generated trace, roughly a mobile client's mix of reads and writes
+REQUEST_MIX = (
+    ('user', 15),
+    ('children', 15),
+    ('child', 10),
+    ('events', 20),
+    ('recent_events', 5),
+    ('event', 10),
+    ('summary', 5),
+    ('statistics', 2),
+    ('create_event', 15),
+    ('login', 3),
+)
+
+
+def generate(households=50, years=2, seed=0):
+    """Insert households of one or two users sharing one to three children, each with years of events.
+
+    Returns the generated IDs, as used by requests.
+    """
+    rng = random.Random(seed)
+    created_at = datetime.now(timezone.utc)
+    password = passwords.hash('password')
+    dataset = {'households': []}
+
+    users, children, guardians, events = [], [], [], []
+    for household in range(households):
+        user_ids = [str(uuid.uuid4()) for _ in range(rng.choice([1, 2, 2, 2]))]
+        child_ids = [str(uuid.uuid4()) for _ in range(rng.choice([1, 1, 2, 3]))]
+        for index, user_id in enumerate(user_ids):
+            users.append({'id': user_id, 'password': password, 'first_name': 'Bench', 'last_name': str(household),
+                          'email_address': 'bench-{0}-{1}@example.com'.format(household, index),
+                          'created_at': created_at})
+        for child_id in child_ids:
+            children.append({'id': child_id, 'first_name': 'Bench', 'last_name': str(household),
+                             'date_of_birth': date.today() - timedelta(days=365 * years), 'created_at': created_at})
+            guardians.extend({'user_id': user_id, 'child_id': child_id} for user_id in user_ids)
+
+        sampled = {}
+        for child_id in child_ids:
+            rows = list(_event_rows(child_id, user_ids, years, rng.randrange(2 ** 32), created_at))
+            sampled[child_id] = [row['id'] for row in rng.sample(rows, min(SAMPLED_EVENTS, len(rows)))]
+            events.extend(rows)
+
+        dataset['households'].append({
+            'users': [(user['id'], user['email_address']) for user in users[-len(user_ids):]],
+            'children': sampled
+        })
+
+    # Give each month of history its own partition before loading it, as flask maintain-event-partitions would
+    existing = set(partitions.partition_months())
+    month = partitions.month_of(min(row['started_at'] for row in events))
+    while month <= partitions.month_of(created_at):
+        if month not in existing:
+            partitions.create_partition(month)
+        month = partitions.add_months(month, 1)
+
+    # Build multi-row INSERTs with psycopg2 directly, as compiling them with SQLAlchemy is slower than generating rows
+    cursor = db.session.connection().connection.cursor()
+    for table, rows in ((User.__table__, users), (Child.__table__, children), (user_child, guardians),
+                        (Event.__table__, events)):
+        columns = list(rows[0])
+        statement = 'INSERT INTO {0} ({1}) VALUES %s'.format(table.name, ', '.join(columns))
+        execute_values(cursor, statement, [[row[column] for column in columns] for row in rows], page_size=PAGE_SIZE)
+    summaries.rebuild([child['id'] for child in children])
+    db.session.commit()
+
+    print('Generated {0} users, {1} children and {2} events'.format(len(users), len(children), len(events)))
+    return dataset
+
+
+def _event_rows(child_id, user_ids, years, seed, created_at):
+    # About 12 events a day, shaped like benchmarks.analytics, ending now rather than at a fixed time
+    now, arrays = synthetic_events(years * 365 * 12, seed=seed)
+    offset = created_at.timestamp() - now
+    rng = np.random.RandomState(seed)
+    user_choices = rng.randint(0, len(user_ids), len(arrays['type']))
+    feed_types = rng.choice(['breast', 'bottle', 'formula'], len(arrays['type']))
+    change_types = rng.choice(['wet', 'soiled', 'dry'], len(arrays['type']))
+
+    for index, kind in enumerate(arrays['type']):
+        row = {'id': str(uuid.uuid4()), 'user_id': user_ids[user_choices[index]], 'child_id': child_id,
+               'started_at': datetime.fromtimestamp(arrays['started_at'][index] + offset, timezone.utc),
+               'ended_at': None, 'feed_type': None, 'change_type': None, 'amount': None, 'unit': None, 'side': None,
+               'notes': None, 'created_at': created_at}
+        if kind == SLEEP:
+            row['type'] = 'sleep'
+            row['ended_at'] = datetime.fromtimestamp(arrays['ended_at'][index] + offset, timezone.utc)
+        elif kind == FEED:
+            row['type'] = 'feed'
+            row['feed_type'] = str(feed_types[index])
+            row['ended_at'] = datetime.fromtimestamp(arrays['ended_at'][index] + offset, timezone.utc)
+            row['amount'] = round(float(arrays['amount_ml'][index]), 1)
+            row['unit'] = 'ml'
+        elif kind == CHANGE:
+            row['type'] = 'change'
+            row['change_type'] = str(change_types[index])
+        yield row
+
+
+def requests(dataset, count, seed=0):
+    """Generate count requests drawn from REQUEST_MIX against the households in dataset."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*REQUEST_MIX)
+    headers = {'Accept': 'application/json'}
+
+    for kind in rng.choices(kinds, weights, k=count):
+        household = rng.choice(dataset['households'])
+        user_id, email_address = rng.choice(household['users'])
+        child_id = rng.choice(sorted(household['children']))
+        child_path = '/v1/children/{0}'.format(child_id)
+        request = {'method': 'GET', 'headers': headers}
+
+        if kind == 'user':
+            request['path'] = '/v1/users/{0}'.format(user_id)
+        elif kind == 'children':
+            request['path'] = '/v1/children?user_id={0}'.format(user_id)
+        elif kind == 'child':
+            request['path'] = child_path
+        elif kind == 'events':
+            request['path'] = child_path + '/events'
+        elif kind == 'recent_events':
+            since = datetime.utcnow().replace(microsecond=0) - timedelta(days=1)
+            request['path'] = child_path + '/events?since={0}'.format(since.isoformat())
+        elif kind == 'event':
+            request['path'] = child_path + '/events/{0}'.format(rng.choice(household['children'][child_id]))
+        elif kind == 'summary':
+            request['path'] = child_path + '/summary'
+        elif kind == 'statistics':
+            request['path'] = child_path + '/statistics'
+        elif kind == 'create_event':
+            request.update(method='POST', path=child_path + '/events', json={
+                'user_id': user_id, 'child_id': child_id, 'type': 'change', 'change_type': 'wet',
+                'started_at': datetime.now(timezone.utc).isoformat()})
+        elif kind == 'login':
+            request.update(method='POST', path='/v1/auth/login', json={
+                'email_address': email_address, 'password': 'password'})
+        yield request
+
+
+def main(trace, households=50, years=2, count=10000):
+    with app.app_context():
+        dataset = generate(int(households), int(years))
+
+    with open(trace, 'w') as file:
+        for request in requests(dataset, int(count)):
+            file.write(json.dumps(request) + '\n')
+    print('Wrote {0} requests to {1}'.format(count, trace))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:5])
@@ -0,0 +1,89 @@
+"""Load a running API with many concurrent keep-alive connections, to compare the WSGI and ASGI modes.
+
+Usage: python -m benchmarks.load url [connections] [seconds]
+
+Run it once against each mode serving the same database, for example:
+
+    flask run --with-threads --port 5000
+    uvicorn diary_asgi:application --port 8000
+"""
+import asyncio
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+class Connection(object):
+    """A minimal HTTP/1.1 client connection, reopened whenever the server closes it."""
+
+    def __init__(self, url):
+        self.url = urlsplit(url)
+        self.path = self.url.path + ('?' + self.url.query if self.url.query else '')
+        self.reader = self.writer = None
+
+    async def get(self):
+        return await self.request('GET', self.path)
+
+    async def request(self, method, path, headers=None, body=b''):
+        """Send a request on the connection and read the whole response, returning its status code."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.url.hostname, self.url.port or 80)
+
+        headers = dict({'Host': self.url.netloc, 'Accept': 'application/json'}, **(headers or {}))
+        if body:
+            headers['Content-Length'] = str(len(body))
+        head = ''.join('{0}: {1}\r\n'.format(name, value) for name, value in headers.items())
+        self.writer.write('{0} {1} HTTP/1.1\r\n{2}\r\n'.format(method, path, head).encode('latin-1') + body)
+        status_line = await self.reader.readline()
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        else:
+            await self.reader.read()
+
+        if status_line.startswith(b'HTTP/1.0') or headers.get('connection', '').lower() == 'close' \
+                or 'content-length' not in headers:
+            self.writer.close()
+            self.writer = None
+        return int(status_line.split()[1])
+
+
+async def worker(url, deadline, latencies, statuses):
+    connection = Connection(url)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await connection.get()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            connection.writer = None
+            status = 'error'
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def run(url, connections, seconds):
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*[worker(url, deadline, latencies, statuses) for _ in range(connections)])
+    return np.array(latencies), statuses
+
+
+def main(url, connections=100, seconds=10):
+    latencies, statuses = asyncio.run(run(url, int(connections), float(seconds)))
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    print('{0}: {1} connections for {2}s'.format(url, connections, seconds))
+    print('{0:.1f} requests/sec, p50 {1:.1f} ms, p95 {2:.1f} ms, p99 {3:.1f} ms, statuses {4}'.format(
+        len(latencies) / float(seconds), p50, p95, p99, statuses))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:4])
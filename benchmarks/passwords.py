@@ -0,0 +1,35 @@
+"""Measure password checks per second through app.passwords.PasswordHasher, as a proxy for logins per second.
+
+Usage: python -m benchmarks.passwords [rounds] [checks]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.passwords import PasswordHasher
+
+
+def main(rounds=12, checks=64):
+    cores = os.cpu_count() or 1
+    config = {
+        'BCRYPT_LOG_ROUNDS': rounds,
+        'PASSWORD_HASH_WORKERS': cores,
+        'PASSWORD_HASH_QUEUE_DEPTH': checks,
+        'PASSWORD_HASH_TIMEOUT': None,
+    }
+    hasher = PasswordHasher(type('App', (object,), {'config': config}))
+    hashed = hasher.hash('password')
+
+    # Simulate concurrent request threads all logging in at once
+    with ThreadPoolExecutor(max_workers=checks) as requests:
+        started = time.perf_counter()
+        assert all(requests.map(lambda _: hasher.check('password', hashed), range(checks)))
+        elapsed = time.perf_counter() - started
+
+    print('bcrypt cost {0}: {1} checks on {2} cores in {3:.2f}s'.format(rounds, checks, cores, elapsed))
+    print('{0:.1f} logins/sec, {1:.1f} logins/sec per core'.format(checks / elapsed, checks / elapsed / cores))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,172 @@
+"""Replay a JSONL request trace and report requests/sec and p50/p95/p99 latency for each route, optionally
+comparing them against a stored baseline.
+
+Usage: python -m benchmarks.replay trace [--url URL] [--connections N] [--repeat N]
+                                   [--save FILE] [--baseline FILE] [--tolerance FRACTION]
+
+Each line of the trace is a request such as benchmarks.data writes:
+
+    {"method": "POST", "path": "/v1/auth/login", "headers": {"Accept": "application/json"}, "json": {...}}
+
+Without --url the trace is replayed through the Flask test client against DATABASE_URL, which measures the
+application alone. With --url it is replayed against a running server over concurrent keep-alive connections.
+Exits with status 1 when a route is slower or handles fewer requests per second than the baseline allows.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+from werkzeug.exceptions import HTTPException
+
+from app import app
+from benchmarks.load import Connection
+
+# Summary key for all requests in the trace, whatever their route
+TOTAL = 'total'
+
+
+def load_trace(path):
+    """Read a trace of requests, one JSON object per line."""
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def route(request):
+    """Label a request with its method and URL rule, so requests for different records are grouped together."""
+    adapter = app.url_map.bind('localhost')
+    try:
+        rule, arguments = adapter.match(request['path'].partition('?')[0], request['method'], return_rule=True)
+    except HTTPException:
+        return '{0} unmatched'.format(request['method'])
+    return '{0} {1}'.format(request['method'], rule.rule)
+
+
+def replay_client(trace, repeat=1):
+    """Send each request in turn through the test client, returning (route, status, seconds) for each."""
+    client = app.test_client()
+    results = []
+    for request in itertools.chain.from_iterable(itertools.repeat(trace, repeat)):
+        started = time.perf_counter()
+        response = client.open(request['path'], method=request['method'], headers=request.get('headers'),
+                               json=request.get('json'))
+        response.close()
+        results.append((route(request), response.status_code, time.perf_counter() - started))
+    return results
+
+
+def replay_server(url, trace, connections=10, repeat=1):
+    """Send the requests to a running server over concurrent connections, returning (route, status, seconds)."""
+    requests = itertools.chain.from_iterable(itertools.repeat(trace, repeat))
+    results = []
+
+    async def worker():
+        connection = Connection(url)
+        # Every worker takes the next request from the shared iterator, so the trace is sent once in total
+        for request in requests:
+            body = json.dumps(request['json']).encode('UTF-8') if 'json' in request else b''
+            headers = dict(request.get('headers') or {})
+            if body:
+                headers['Content-Type'] = 'application/json'
+            started = time.perf_counter()
+            try:
+                status = await connection.request(request['method'], request['path'], headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                connection.writer = None
+                status = 'error'
+            results.append((route(request), status, time.perf_counter() - started))
+
+    async def run():
+        await asyncio.gather(*[worker() for _ in range(connections)])
+
+    asyncio.run(run())
+    return results
+
+
+def summarize(results, elapsed):
+    """Compute the request count, errors, requests/sec and latency percentiles in milliseconds for each route."""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for label, status, seconds in results:
+        for key in (label, TOTAL):
+            latencies[key].append(seconds)
+            if status == 'error' or status >= 500:
+                errors[key] += 1
+
+    summary = OrderedDict()
+    for key in sorted(latencies, key=lambda key: (key == TOTAL, key)):
+        p50, p95, p99 = np.percentile(latencies[key], [50, 95, 99]) * 1000
+        summary[key] = OrderedDict([
+            ('requests', len(latencies[key])),
+            ('errors', errors[key]),
+            ('requests_per_second', round(len(latencies[key]) / elapsed, 1)),
+            ('p50', round(p50, 2)),
+            ('p95', round(p95, 2)),
+            ('p99', round(p99, 2)),
+        ])
+    return summary
+
+
+def compare(summary, baseline, tolerance=0.2):
+    """List the routes whose p95 latency or requests/sec are worse than the baseline by more than tolerance."""
+    regressions = []
+    for key, result in summary.items():
+        if key not in baseline:
+            continue
+        expected = baseline[key]
+        if result['p95'] > expected['p95'] * (1 + tolerance):
+            regressions.append('{0}: p95 {1} ms, baseline {2} ms'.format(key, result['p95'], expected['p95']))
+        if result['requests_per_second'] < expected['requests_per_second'] * (1 - tolerance):
+            regressions.append('{0}: {1} requests/sec, baseline {2} requests/sec'.format(
+                key, result['requests_per_second'], expected['requests_per_second']))
+    return regressions
+
+
+def report(summary):
+    width = max(len(key) for key in summary)
+    print('{0:<{width}} {1:>8} {2:>6} {3:>9} {4:>9} {5:>9} {6:>9}'.format(
+        'route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', width=width))
+    for key, result in summary.items():
+        print('{0:<{width}} {requests:>8} {errors:>6} {requests_per_second:>9.1f} {p50:>9.2f} {p95:>9.2f} '
+              '{p99:>9.2f}'.format(key, width=width, **result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.replay', description=__doc__.splitlines()[0])
+    parser.add_argument('trace', help='JSONL file of requests to replay')
+    parser.add_argument('--url', help='base URL of a running server, instead of the in-process test client')
+    parser.add_argument('--connections', type=int, default=10, help='concurrent connections when using --url')
+    parser.add_argument('--repeat', type=int, default=1, help='times to replay the trace')
+    parser.add_argument('--save', help='write the results to this file, for use as a baseline')
+    parser.add_argument('--baseline', help='compare the results with a file written by --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed fractional regression (default 0.2)')
+    args = parser.parse_args(argv)
+
+    trace = load_trace(args.trace)
+    started = time.perf_counter()
+    if args.url:
+        results = replay_server(args.url, trace, args.connections, args.repeat)
+    else:
+        results = replay_client(trace, args.repeat)
+    summary = summarize(results, time.perf_counter() - started)
+    report(summary)
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(summary, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(summary, json.load(file), args.tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Time the per-request validation and serialization overhead, before and after compiling validators once.
+
+Usage: python -m benchmarks.serialization [repeats]
+"""
+import json
+import sys
+import timeit
+
+from jsonschema import FormatChecker, ValidationError, validate
+
+from app.encoding import orjson, orjson_dumps, stdlib_dumps
+from app.schemas import validator
+
+REQUEST = {
+    "child_id": "5d1d8f0f-d61b-4d24-9b3c-7d8e0a55f8b4",
+    "user_id": "2f6e2f4e-8a0b-4e63-a5a3-0ee1ac3b2b7d",
+    "type": "feed",
+    "feed_type": "bottle",
+    "started_at": "2019-04-20T07:30:00+00:00",
+    "ended_at": "2019-04-20T07:45:00+00:00",
+    "amount": 120.0,
+    "unit": "ml",
+    "notes": "Finished the bottle",
+}
+
+EVENTS = [dict(REQUEST, id=str(i), created_at="2019-04-20T07:46:00+00:00", updated_at=None) for i in range(100)]
+
+# Views parsed the spec once at import before as well, so it is read outside the timed functions
+with open('openapi.json') as json_file:
+    EVENT_SCHEMA = json.load(json_file)["components"]["schemas"]["EventRequest"]
+
+
+def before():
+    """Check the schema and build a fresh validator and format checker, as every request used to."""
+    try:
+        validate(REQUEST, EVENT_SCHEMA, format_checker=FormatChecker())
+    except ValidationError:
+        pass
+    return json.dumps(EVENTS, sort_keys=True, separators=(',', ':'))
+
+
+def after(dumps):
+    """Use the cached validator and the given encoder."""
+    next(validator("EventRequest").iter_errors(REQUEST), None)
+    return dumps(EVENTS)
+
+
+def main(repeats=1000):
+    cases = [('before', before), ('after, json', lambda: after(stdlib_dumps))]
+    if orjson is not None:
+        cases.append(('after, orjson', lambda: after(orjson_dumps)))
+
+    for name, function in cases:
+        best = min(timeit.repeat(function, number=1, repeat=repeats))
+        print('{0}: {1:.1f} us per request, best of {2}'.format(name, best * 1000000, repeats))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,32 @@
+"""Measure access token verifications per second through app.tokens.Tokens, to compare with benchmarks.passwords.
+
+Usage: python -m benchmarks.tokens [verifications]
+"""
+import sys
+import time
+
+from app.tokens import Tokens
+
+
+def main(verifications=100000):
+    config = {
+        'SECRET_KEY': 'benchmark',
+        'ACCESS_TOKEN_TTL': 900,
+        'REFRESH_TOKEN_TTL': 2592000,
+        'TOKEN_DENYLIST_MAX_ENTRIES': 10000,
+    }
+    tokens = Tokens(type('App', (object,), {'config': config, 'extensions': {}}))
+    user = type('User', (object,), {'id': '00000000-0000-0000-0000-000000000000', 'password': b'hash'})
+    access_token = tokens.issue(user)['access_token']
+
+    started = time.perf_counter()
+    for _ in range(verifications):
+        tokens.verify_access(access_token)
+    elapsed = time.perf_counter() - started
+
+    print('{0} verifications in {1:.2f}s'.format(verifications, elapsed))
+    print('{0:.1f} verifications/sec, {1:.1f} us each'.format(verifications / elapsed, elapsed / verifications * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
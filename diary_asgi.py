@@ -0,0 +1,4 @@
+from app import app
+from app.asgi import AsyncApp
+
+application = AsyncApp(app)
@@ -3,6 +3,7 @@ from alembic import context
 from sqlalchemy import engine_from_config, pool
 from logging.config import fileConfig
 import logging
+import re
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -65,6 +66,15 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # Event partitions are created by flask maintain-event-partitions, and indexes on the partitioned event table are
+    # not reflected, so leave both out of autogenerate
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and reflected and re.match(r'^event_(y\d{4}m\d{2}|default)$', name):
+            return False
+        if type_ == 'index' and not reflected and compare_to is None and object.table.name == 'event':
+            return False
+        return True
+
     engine = engine_from_config(config.get_section(config.config_ini_section),
                                 prefix='sqlalchemy.',
                                 poolclass=pool.NullPool)
@@ -73,6 +83,7 @@ def run_migrations_online():
     context.configure(connection=connection,
                       target_metadata=target_metadata,
                       process_revision_directives=process_revision_directives,
+                      include_object=include_object,
                       **current_app.extensions['migrate'].configure_args)
 
     try:
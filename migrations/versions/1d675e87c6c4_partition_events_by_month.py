@@ -0,0 +1,102 @@
+"""partition events by month
+
+Revision ID: 1d675e87c6c4
+Revises: 312a203dabe4
+Create Date: 2026-10-18 07:18:40.031749
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '1d675e87c6c4'
+down_revision = '312a203dabe4'
+branch_labels = None
+depends_on = None
+
+# Partitions are created up to this many months ahead, after which flask maintain-event-partitions takes over
+MONTHS_AHEAD = 3
+
+
+def event_table(name, *args, **kwargs):
+    return op.create_table(name,
+    sa.Column('id', postgresql.UUID(), nullable=False),
+    sa.Column('user_id', postgresql.UUID(), nullable=True),
+    sa.Column('child_id', postgresql.UUID(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ended_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('unit', sa.String(), nullable=True),
+    sa.Column('side', sa.String(), nullable=True),
+    sa.Column('change_type', sa.String(), nullable=True),
+    sa.Column('feed_type', sa.String(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['child_id'], ['child.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user_account.id'], ondelete='SET NULL'),
+    *args,
+    **kwargs
+    )
+
+
+def create_event_indexes():
+    op.create_index('ix_event_child_id_started_at_id', 'event', ['child_id', sa.text('started_at DESC'), 'id'], unique=False)
+    op.create_index(op.f('ix_event_created_at'), 'event', ['created_at'], unique=False)
+    op.create_index(op.f('ix_event_started_at'), 'event', ['started_at'], unique=False)
+    op.create_index(op.f('ix_event_user_id'), 'event', ['user_id'], unique=False)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade():
+    # Copy events into a new partitioned table, building its indexes once they are loaded. This rewrites every event,
+    # so run it while the API is stopped
+    op.rename_table('event', 'event_unpartitioned')
+    op.execute('ALTER TABLE event_unpartitioned DROP CONSTRAINT event_pkey')
+    for index in ('ix_event_child_id_started_at_id', 'ix_event_created_at', 'ix_event_started_at', 'ix_event_user_id'):
+        op.drop_index(index, table_name='event_unpartitioned')
+
+    event_table('event', sa.PrimaryKeyConstraint('id', 'started_at'), postgresql_partition_by='RANGE (started_at)')
+    op.execute('CREATE TABLE event_default PARTITION OF event DEFAULT')
+
+    first = op.get_bind().execute(sa.text("SELECT date_trunc('month', min(started_at) AT TIME ZONE 'UTC') "
+                                          "FROM event_unpartitioned")).scalar()
+    now = datetime.now(timezone.utc)
+    month = add_months(first or now, 0)
+    while month <= add_months(now, MONTHS_AHEAD):
+        op.execute("CREATE TABLE event_y{0:%Y}m{0:%m} PARTITION OF event FOR VALUES FROM ('{1}') TO ('{2}')".format(
+            month, month.isoformat(), add_months(month, 1).isoformat()))
+        month = add_months(month, 1)
+
+    op.execute('INSERT INTO event (id, user_id, child_id, started_at, ended_at, created_at, updated_at, amount, type, '
+               'unit, side, change_type, feed_type, notes) SELECT id, user_id, child_id, started_at, ended_at, '
+               'created_at, updated_at, amount, type, unit, side, change_type, feed_type, notes '
+               'FROM event_unpartitioned')
+    op.drop_table('event_unpartitioned')
+    create_event_indexes()
+    op.execute('ANALYZE event')
+
+
+def downgrade():
+    # Partitions that have been detached are not copied back
+    op.rename_table('event', 'event_partitioned')
+    op.execute('ALTER TABLE event_partitioned DROP CONSTRAINT event_pkey')
+    for index in ('ix_event_child_id_started_at_id', 'ix_event_created_at', 'ix_event_started_at', 'ix_event_user_id'):
+        op.drop_index(index, table_name='event_partitioned')
+
+    event_table('event', sa.PrimaryKeyConstraint('id'))
+    op.execute('INSERT INTO event (id, user_id, child_id, started_at, ended_at, created_at, updated_at, amount, type, '
+               'unit, side, change_type, feed_type, notes) SELECT id, user_id, child_id, started_at, ended_at, '
+               'created_at, updated_at, amount, type, unit, side, change_type, feed_type, notes '
+               'FROM event_partitioned')
+    op.drop_table('event_partitioned')
+    create_event_indexes()